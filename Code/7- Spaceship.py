@@ -2,44 +2,27 @@
 #--------------------------------------------------------
 # miniproject 7 - Spaceship
 import simplegui
-import math
 import random
 
-#--------------------------------------------------------
-
-
-# helper functions and classes
-
-
-# class which contains information for an image
-class ImageInfo:
-    def __init__(self, center, size, radius = 0, lifespan = None, animated = False):
-        self.center = center
-        self.size = size
-        self.radius = radius
-        if lifespan:
-            self.lifespan = lifespan
-        else:
-            self.lifespan = float('inf')
-        self.animated = animated
-
-    def get_center(self):
-        return self.center
-
-    def get_size(self):
-        return self.size
+# ImageInfo, the Ship / Sprite base class and vector helpers shared with
+# the RiceRocks game - engine.py has to sit next to this file, so the game
+# no longer runs as a single file pasted into CodeSkulptor
+from engine import BackgroundLayer, Body, FrameRecorder, ImageInfo, LoadGovernor, angle_to_vector, asset_url, load_art
+
+try:
+    from time import perf_counter as frame_clock
+except ImportError:
+    from time import time as frame_clock
+
+# the optional helpers below are written for Python 3.7+ - under an older
+# Python (2.7 included) importing one is a SyntaxError, and the game runs
+# without it just as when the file is missing
+try:
+    from background_strip import make_compositor
+except (ImportError, SyntaxError):
+    # nothing to compose images with - the background is drawn layer by layer
+    make_compositor = None
 
-    def get_radius(self):
-        return self.radius
-
-    def get_lifespan(self):
-        return self.lifespan
-
-    def get_animated(self):
-        return self.animated
-
-    
-    
 #--------------------------------------------------------    
 #--------------------------------------------------------    
 # -----------------------------------------------------------------------------
@@ -49,43 +32,57 @@ class ImageInfo:
 # debris images - debris1_brown.png, debris2_brown.png, debris3_brown.png, debris4_brown.png
 #                 debris1_blue.png, debris2_blue.png, debris3_blue.png, debris4_blue.png, debris_blend.png
 debris_info = ImageInfo([320, 240], [640, 480])
-debris_image = simplegui.load_image("http://commondatastorage.googleapis.com/codeskulptor-assets/lathrop/debris2_blue.png")
+debris_url = "http://commondatastorage.googleapis.com/codeskulptor-assets/lathrop/debris2_blue.png"
 
 # nebula images - nebula_brown.png, nebula_blue.png
 nebula_info = ImageInfo([400, 300], [800, 600])
-nebula_image = simplegui.load_image("http://commondatastorage.googleapis.com/codeskulptor-assets/lathrop/nebula_blue.f2014.png")
+nebula_url = "http://commondatastorage.googleapis.com/codeskulptor-assets/lathrop/nebula_blue.f2014.png"
 
 # splash image
 splash_info = ImageInfo([200, 150], [400, 300])
-splash_image = simplegui.load_image("http://commondatastorage.googleapis.com/codeskulptor-assets/lathrop/splash.png")
+splash_url = "http://commondatastorage.googleapis.com/codeskulptor-assets/lathrop/splash.png"
 
 # ship image
-ship_info = ImageInfo([45, 45], [90, 90], 35)
-ship_image = simplegui.load_image("http://commondatastorage.googleapis.com/codeskulptor-assets/lathrop/double_ship.png")
+ship_info = ImageInfo([45, 45], [90, 90], 35, frames = 2)
+ship_url = "http://commondatastorage.googleapis.com/codeskulptor-assets/lathrop/double_ship.png"
 
 # missile image - shot1.png, shot2.png, shot3.png
 missile_info = ImageInfo([5,5], [10, 10], 3, 50)
-missile_image = simplegui.load_image("http://commondatastorage.googleapis.com/codeskulptor-assets/lathrop/shot2.png")
+missile_url = "http://commondatastorage.googleapis.com/codeskulptor-assets/lathrop/shot2.png"
 
 # asteroid images - asteroid_blue.png, asteroid_brown.png, asteroid_blend.png
 asteroid_info = ImageInfo([45, 45], [90, 90], 40)
-asteroid_image = simplegui.load_image("http://commondatastorage.googleapis.com/codeskulptor-assets/lathrop/asteroid_blue.png")
+asteroid_url = "http://commondatastorage.googleapis.com/codeskulptor-assets/lathrop/asteroid_blue.png"
 
 # animated explosion - explosion_orange.png, explosion_blue.png, explosion_blue2.png, explosion_alpha.png
 explosion_info = ImageInfo([64, 64], [128, 128], 17, 24, True)
-explosion_image = simplegui.load_image("http://commondatastorage.googleapis.com/codeskulptor-assets/lathrop/explosion_alpha.png")
+explosion_url = "http://commondatastorage.googleapis.com/codeskulptor-assets/lathrop/explosion_alpha.png"
+
+# one atlas sheet for all of them when the images are cached locally (see
+# load_art in engine.py)
+(debris_image, nebula_image, splash_image, ship_image, missile_image, asteroid_image,
+ explosion_image) = load_art(simplegui.load_image, [
+    (debris_url, debris_info), (nebula_url, nebula_info), (splash_url, splash_info),
+    (ship_url, ship_info), (missile_url, missile_info), (asteroid_url, asteroid_info),
+    (explosion_url, explosion_info)])
 
 # sound assets purchased from sounddogs.com, please do not redistribute
-soundtrack = simplegui.load_sound("http://commondatastorage.googleapis.com/codeskulptor-assets/sounddogs/soundtrack.mp3")
-missile_sound = simplegui.load_sound("http://commondatastorage.googleapis.com/codeskulptor-assets/sounddogs/missile.mp3")
+soundtrack = simplegui.load_sound(asset_url("http://commondatastorage.googleapis.com/codeskulptor-assets/sounddogs/soundtrack.mp3"))
+missile_sound = simplegui.load_sound(asset_url("http://commondatastorage.googleapis.com/codeskulptor-assets/sounddogs/missile.mp3"))
 missile_sound.set_volume(.5)
-ship_thrust_sound = simplegui.load_sound("http://commondatastorage.googleapis.com/codeskulptor-assets/sounddogs/thrust.mp3")
-explosion_sound = simplegui.load_sound("http://commondatastorage.googleapis.com/codeskulptor-assets/sounddogs/explosion.mp3")
+ship_thrust_sound = simplegui.load_sound(asset_url("http://commondatastorage.googleapis.com/codeskulptor-assets/sounddogs/thrust.mp3"))
+explosion_sound = simplegui.load_sound(asset_url("http://commondatastorage.googleapis.com/codeskulptor-assets/sounddogs/explosion.mp3"))
 
 # alternative upbeat soundtrack by composer and former IIPP student Emiel Stopler
 # please do not redistribute without permission from Emiel at http://www.filmcomposer.nl
 #soundtrack = simplegui.load_sound("https://storage.googleapis.com/codeskulptor-assets/ricerocks_theme.mp3")
 
+# renders image layers into one new image for the background strip
+if make_compositor is not None:
+    background_compositor = make_compositor(simplegui.load_image)
+else:
+    background_compositor = None
+
 
 
 # -----------------------------------------------------------------------------
@@ -105,54 +102,122 @@ time = 0
 
 FRICTION_CONSTANT = 0.05
 
+# missile slots - at most this many shots are in flight at once
+MISSILE_CAPACITY = 16
+
+# physics runs at a fixed PHYSICS_RATE steps a second whatever the frame
+# rate, and draws interpolate between the last two steps. a draw runs at
+# most MAX_PHYSICS_STEPS steps and drops the rest of a backlog (e.g. after
+# the tab was hidden) rather than trying to catch up all at once
+PHYSICS_RATE = 60
+PHYSICS_STEP = 1.0 / PHYSICS_RATE
+MAX_PHYSICS_STEPS = 5
+# clock rounding below this is not counted against a whole step
+STEP_TOLERANCE = 1e-6
+accumulator = 0
+last_frame = None
+
 #---------------------------------------------------------
 
 
 
 
-# helper functions to handle transformations
-def angle_to_vector(ang):
-    return [math.cos(ang), math.sin(ang)]
+# where to draw an object a fraction alpha of the way from its position at
+# the previous physics step to its current one, the short way round the
+# wrapped screen
+def interpolate(prev, pos, alpha):
+    dx = (pos[0] - prev[0] + WIDTH / 2.0) % WIDTH - WIDTH / 2.0
+    dy = (pos[1] - prev[1] + HEIGHT / 2.0) % HEIGHT - HEIGHT / 2.0
+    return [(prev[0] + alpha * dx) % WIDTH, (prev[1] + alpha * dy) % HEIGHT]
 
-def dist(p,q):
-    return math.sqrt((p[0] - q[0]) ** 2+(p[1] - q[1]) ** 2)
+# -----------------------------------------------------------------------------
+
+# desired state of each sound - play, pause and rewind only reach the audio
+# backend when a sound is asked for a state it is not already in, and each
+# call that could be skipped is counted against the sound that got it
+PLAYING = "playing"
+PAUSED = "paused"
+REWOUND = "rewound"
+
+class SoundBoard:
+    def __init__(self):
+        self.names = {}
+        self.states = {}
+        self.issued = {}
+        self.saved = {}
+
+    def add(self, sound, name):
+        self.names[sound] = name
+        self.states[sound] = REWOUND
+        self.issued[sound] = 0
+        self.saved[sound] = 0
+
+    def set_state(self, sound, state):
+        if self.states[sound] == state:
+            self.saved[sound] += 1
+            return
+        self.states[sound] = state
+        self.issued[sound] += 1
+        if state == PLAYING:
+            sound.play()
+        elif state == PAUSED:
+            sound.pause()
+        else:
+            sound.rewind()
+
+    def play(self, sound):
+        self.set_state(sound, PLAYING)
+
+    def pause(self, sound):
+        self.set_state(sound, PAUSED)
+
+    def rewind(self, sound):
+        self.set_state(sound, REWOUND)
+
+    def restart(self, sound):
+        # a one-shot sound starts over on every trigger, so this always
+        # reaches the backend
+        self.rewind(sound)
+        self.play(sound)
+
+    def stats(self):
+        stats = {}
+        for sound in self.names:
+            stats[self.names[sound]] = {"issued": self.issued[sound], "saved": self.saved[sound]}
+        return stats
 
 # -----------------------------------------------------------------------------
 
 # Ship class
-class Ship:
+class Ship(Body):
+    __slots__ = ("thrust", "prev_pos", "prev_angle")
+
     def __init__(self, pos, vel, angle, image, info):
-        self.pos = [pos[0],pos[1]]
-        self.vel = [vel[0],vel[1]]
+        Body.__init__(self, pos, vel, angle, 0, image, info)
         self.thrust = False
-        self.angle = angle
-        self.angle_vel = 0
-        self.image = image
-        self.image_center = info.get_center()
-        self.image_size = info.get_size()
-        self.radius = info.get_radius()
+        self.prev_pos = [pos[0],pos[1]]
+        self.prev_angle = angle
         
-    def draw(self,canvas):
+    def draw(self, canvas, alpha = 1):
+        pos = interpolate(self.prev_pos, self.pos, alpha)
+        angle = self.prev_angle + alpha * (self.angle - self.prev_angle)
         if self.thrust:
-            canvas.draw_image(self.image, [self.image_center[0]+90, self.image_center[1]],
-                              self.image_size, self.pos, self.image_size, self.angle)
+            canvas.draw_image(self.image, self.frames[1],
+                              self.image_size, pos, self.image_size, angle)
             
-            ship_thrust_sound.play()
+            sounds.play(ship_thrust_sound)
             
         else:    
-            canvas.draw_image(self.image, self.image_center, self.image_size, self.pos, self.image_size, self.angle)
-            ship_thrust_sound.rewind()
+            canvas.draw_image(self.image, self.image_center, self.image_size, pos, self.image_size, angle)
+            sounds.rewind(ship_thrust_sound)
             
             
     # motion control scheme for the spaceship        
     def update(self):        
-        self.angle += self.angle_vel
-
-        self.pos[0] += self.vel[0]
-        self.pos[1] += self.vel[1]
-
-        self.pos[0] %= WIDTH
-        self.pos[1] %= HEIGHT
+        self.prev_pos[0] = self.pos[0]
+        self.prev_pos[1] = self.pos[1]
+        self.prev_angle = self.angle
+        self.move(WIDTH, HEIGHT)
 
         self.vel[0] *= (1-FRICTION_CONSTANT)
         self.vel[1] *= (1-FRICTION_CONSTANT)
@@ -165,8 +230,6 @@ class Ship:
             
      
     def shoot(self):
-        global a_missile
-        
         forward_vector = angle_to_vector(self.angle)
 
         missile_pos = [0,0]
@@ -179,41 +242,93 @@ class Ship:
         missile_vel[0] = self.vel[0] + (forward_vector[0]*5)
         missile_vel[1] = self.vel[1] + (forward_vector[1]*5)
         
-        a_missile = Sprite(missile_pos, missile_vel, 0, 0, missile_image, missile_info, missile_sound)    
+        missiles.shoot(missile_pos, missile_vel)
 
                 
 # -----------------------------------------------------------------------------    
     
 # Sprite class
-class Sprite:
+class Sprite(Body):
+    __slots__ = ("lifespan", "animated", "age", "prev_pos", "prev_angle")
+
     def __init__(self, pos, vel, ang, ang_vel, image, info, sound = None):
-        self.pos = [pos[0],pos[1]]
-        self.vel = [vel[0],vel[1]]
-        self.angle = ang
-        self.angle_vel = ang_vel
-        self.image = image
-        self.image_center = info.get_center()
-        self.image_size = info.get_size()
-        self.radius = info.get_radius()
-        self.lifespan = info.get_lifespan()
-        self.animated = info.get_animated()
+        Body.__init__(self, pos, vel, ang, ang_vel, image, info)
+        self.lifespan = info.lifespan
+        self.animated = info.animated
         self.age = 0
+        self.prev_pos = [pos[0],pos[1]]
+        self.prev_angle = ang
         if sound:
-            sound.rewind()
-            sound.play()
+            sounds.restart(sound)
    
-    def draw(self, canvas):
-        canvas.draw_image(self.image, self.image_center, self.image_size, self.pos, self.image_size, self.angle)        
+    def draw(self, canvas, alpha = 1):
+        pos = interpolate(self.prev_pos, self.pos, alpha)
+        angle = self.prev_angle + alpha * (self.angle - self.prev_angle)
+        canvas.draw_image(self.image, self.image_center, self.image_size, pos, self.image_size, angle)
 
     def update(self):
-        self.angle += self.angle_vel
+        self.prev_pos[0] = self.pos[0]
+        self.prev_pos[1] = self.pos[1]
+        self.prev_angle = self.angle
+        self.move(WIDTH, HEIGHT)
 
-        self.pos[0] += self.vel[0]
-        self.pos[1] += self.vel[1]
 
-        self.pos[0] %= WIDTH
-        self.pos[1] %= HEIGHT        
+# -----------------------------------------------------------------------------
+
+# fixed ring of missile slots - each shot takes the next slot in turn
+# (replacing the oldest shot once every slot is in flight) and writes its
+# numbers into lists allocated up front, so shooting creates no objects.
+# a slot is live while its age is below the missile lifespan.
+class MissileRing:
+    def __init__(self, capacity, image, info, sound = None):
+        self.capacity = capacity
+        self.image = image
+        self.image_center = info.get_center()
+        self.image_size = info.get_size()
+        self.radius = info.get_radius()
+        self.lifespan = info.get_lifespan()
+        self.sound = sound
+        self.head = 0
+        self.x = [0.0] * capacity
+        self.y = [0.0] * capacity
+        self.vx = [0.0] * capacity
+        self.vy = [0.0] * capacity
+        self.prev_x = [0.0] * capacity
+        self.prev_y = [0.0] * capacity
+        self.age = [self.lifespan] * capacity
+
+    def shoot(self, pos, vel):
+        i = self.head
+        self.x[i] = self.prev_x[i] = pos[0]
+        self.y[i] = self.prev_y[i] = pos[1]
+        self.vx[i] = vel[0]
+        self.vy[i] = vel[1]
+        self.age[i] = 0
+        self.head = (i + 1) % self.capacity
+        if self.sound:
+            sounds.restart(self.sound)
+
+    def live(self):
+        count = 0
+        for age in self.age:
+            if age < self.lifespan:
+                count += 1
+        return count
 
+    def update(self):
+        for i in range(self.capacity):
+            if self.age[i] < self.lifespan:
+                self.prev_x[i] = self.x[i]
+                self.prev_y[i] = self.y[i]
+                self.x[i] = (self.x[i] + self.vx[i]) % WIDTH
+                self.y[i] = (self.y[i] + self.vy[i]) % HEIGHT
+                self.age[i] += 1
+
+    def draw(self, canvas, alpha = 1):
+        for i in range(self.capacity):
+            if self.age[i] < self.lifespan:
+                pos = interpolate([self.prev_x[i], self.prev_y[i]], [self.x[i], self.y[i]], alpha)
+                canvas.draw_image(self.image, self.image_center, self.image_size, pos, self.image_size)
 
 # -----------------------------------------------------------------------------    
 # -----------------------------------------------------------------------------
@@ -222,31 +337,64 @@ class Sprite:
 
 # event handlers
 
-def draw(canvas):
+# one fixed physics step
+def step():
     global time
+    time += 1
+    my_ship.update()
+    a_rock.update()
+    missiles.update()
+
+def draw(canvas):
+    global accumulator, last_frame
     
+    # run as many physics steps as the time since the last frame covers
+    now = frame_clock()
+    governor.start_frame(now)
+    if last_frame is None:
+        accumulator += PHYSICS_STEP
+    else:
+        accumulator += now - last_frame
+    last_frame = now
+
+    steps = 0
+    while accumulator + STEP_TOLERANCE >= PHYSICS_STEP and steps < MAX_PHYSICS_STEPS:
+        step()
+        accumulator -= PHYSICS_STEP
+        steps += 1
+    if accumulator >= PHYSICS_STEP:
+        accumulator = accumulator % PHYSICS_STEP
+
+    # under heavy load the governor skips drawing every other frame - the
+    # physics above still ran and the canvas gets the last drawn frame again
+    # (frames are only recorded for that once the governor is close to
+    # skipping)
+    if frame_recorder.calls and not governor.render_frame():
+        frame_recorder.replay(canvas)
+        governor.end_frame(frame_clock())
+        return
+    if governor.record_frame():
+        frame_recorder.begin(canvas)
+        canvas = frame_recorder
+    else:
+        frame_recorder.forget()
+
+    # how far into the next step this frame falls
+    alpha = max(0, accumulator / PHYSICS_STEP)
+
     # animiate background
-    time += 1
-    wtime = (time / 4) % WIDTH
-    center = debris_info.get_center()
-    size = debris_info.get_size()
-    canvas.draw_image(nebula_image, nebula_info.get_center(), nebula_info.get_size(), [WIDTH / 2, HEIGHT / 2], [WIDTH, HEIGHT])
-    canvas.draw_image(debris_image, center, size, (wtime - WIDTH / 2, HEIGHT / 2), (WIDTH, HEIGHT))
-    canvas.draw_image(debris_image, center, size, (wtime + WIDTH / 2, HEIGHT / 2), (WIDTH, HEIGHT))
+    wtime = ((time + alpha) / 4) % WIDTH
+    background.draw(canvas, wtime, not governor.skip_debris())
 
     # draw ship and sprites
-    my_ship.draw(canvas)
-    a_rock.draw(canvas)
-    a_missile.draw(canvas)
-    
-    # update ship and sprites
-    my_ship.update()
-    a_rock.update()
-    a_missile.update()
+    my_ship.draw(canvas, alpha)
+    a_rock.draw(canvas, alpha)
+    missiles.draw(canvas, alpha)
     
     # draw lives and score
     canvas.draw_text("Lives: " + str(lives), [WIDTH - 120, 40], 30, "white")
     canvas.draw_text("Score: " + str(score), [WIDTH - 120, 80], 30, "white")
+    governor.end_frame(frame_clock())
 
 # -----------------------------------------------------------------------------    
      
@@ -300,9 +448,18 @@ frame = simplegui.create_frame("Asteroids", WIDTH, HEIGHT)
 # -----------------------------------------------------------------------------
 
 # initialize ship and two sprites
+sounds = SoundBoard()
+sounds.add(soundtrack, "soundtrack")
+sounds.add(missile_sound, "missile")
+sounds.add(ship_thrust_sound, "thrust")
+sounds.add(explosion_sound, "explosion")
+background = BackgroundLayer(nebula_image, nebula_info, debris_image, debris_info, WIDTH, HEIGHT,
+                             background_compositor)
 my_ship = Ship([WIDTH / 2, HEIGHT / 2], [0, 0], 0, ship_image, ship_info)
 a_rock = Sprite([WIDTH / 3, HEIGHT / 3], [1, 1], 0, 0, asteroid_image, asteroid_info)
-a_missile = Sprite([2 * WIDTH / 3, 2 * HEIGHT / 3], [-1,1], 0, 0, missile_image, missile_info, missile_sound)
+missiles = MissileRing(MISSILE_CAPACITY, missile_image, missile_info, missile_sound)
+frame_recorder = FrameRecorder()
+governor = LoadGovernor()
 
 
 # -----------------------------------------------------------------------------
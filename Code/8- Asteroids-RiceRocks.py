@@ -5,39 +5,95 @@ import simplegui
 import math
 import random
 
-#-------------------------------------------------------------------
+# ImageInfo, the Ship / Sprite base class and vector helpers shared with
+# the Spaceship game - engine.py has to sit next to this file, so the game
+# no longer runs as a single file pasted into CodeSkulptor
+from engine import BackgroundLayer, Body, FrameRecorder, ImageInfo, LoadGovernor, angle_to_vector, asset_url, grid_nearest, grid_shape, load_art
 
+try:
+    from time import perf_counter as clock
+except ImportError:
+    from time import time as clock
 
-# helper classes
+try:
+    import atexit
+except ImportError:
+    atexit = None
 
-class ImageInfo:
-    def __init__(self, center, size, radius = 0, lifespan = None, animated = False):
-        self.center = center
-        self.size = size
-        self.radius = radius
-        if lifespan:
-            self.lifespan = lifespan
-        else:
-            self.lifespan = float('inf')
-        self.animated = animated
+try:
+    import os
+except ImportError:
+    os = None
 
-    def get_center(self):
-        return self.center
+try:
+    import numpy
+except ImportError:
+    # no numpy installed - sprite groups are plain SpriteGroups
+    numpy = None
 
-    def get_size(self):
-        return self.size
+# the optional helpers below are written for Python 3.7+ - under an older
+# Python (2.7 included) importing one is a SyntaxError, and the game runs
+# without it just as when the file is missing
+try:
+    from asset_loader import AssetLoader
+except (ImportError, SyntaxError):
+    # asset_loader.py not alongside the game - simplegui loads assets itself
+    AssetLoader = None
 
-    def get_radius(self):
-        return self.radius
+try:
+    from background_strip import make_compositor
+except (ImportError, SyntaxError):
+    # nothing to compose images with - the background is drawn layer by layer
+    make_compositor = None
 
-    def get_lifespan(self):
-        return self.lifespan
+try:
+    from rotation_cache import make_rotation_cache
+except (ImportError, SyntaxError):
+    # nothing to pre-rotate sprites with - the canvas rotates them every draw
+    make_rotation_cache = None
 
-    def get_animated(self):
-        return self.animated
+try:
+    from replay import InputJournal
+except (ImportError, SyntaxError):
+    # replay.py not alongside the game - sessions cannot be journaled
+    InputJournal = None
 
-    
 #-------------------------------------------------------------------
+
+
+#-------------------------------------------------------------------
+
+# with an AssetLoader every fetch starts at once and load_image / load_sound
+# hand back lazy handles straight away; images are skipped when drawn until
+# they have arrived and sounds stay silent until theirs has
+if AssetLoader is not None:
+    assets = AssetLoader(simplegui.load_image, simplegui.load_sound)
+else:
+    assets = None
+
+def load_image(url):
+    if assets is not None:
+        return assets.image(url)
+    return simplegui.load_image(url)
+
+def load_sound(url):
+    if assets is not None:
+        return assets.sound(asset_url(url))
+    return simplegui.load_sound(asset_url(url))
+
+# several handles on one sound, so overlapping plays need not cut each
+# other off - the mixer rotates through them
+def load_voices(url, count):
+    voices = []
+    for i in range(count):
+        voices.append(load_sound(url))
+    return voices
+
+def ready_image(image):
+    if assets is not None:
+        return assets.resolve(image)
+    return image
+
 #-------------------------------------------------------------------
     
 # art assets created by Kim Lathrop, may be freely re-used in non-commercial projects, please credit Kim
@@ -45,42 +101,59 @@ class ImageInfo:
 # debris images - debris1_brown.png, debris2_brown.png, debris3_brown.png, debris4_brown.png
 #                 debris1_blue.png, debris2_blue.png, debris3_blue.png, debris4_blue.png, debris_blend.png
 debris_info = ImageInfo([320, 240], [640, 480])
-debris_image = simplegui.load_image("http://commondatastorage.googleapis.com/codeskulptor-assets/lathrop/debris2_blue.png")
+debris_url = "http://commondatastorage.googleapis.com/codeskulptor-assets/lathrop/debris2_blue.png"
 
 # nebula images - nebula_brown.png, nebula_blue.png
 nebula_info = ImageInfo([400, 300], [800, 600])
-nebula_image = simplegui.load_image("http://commondatastorage.googleapis.com/codeskulptor-assets/lathrop/nebula_blue.f2014.png")
+nebula_url = "http://commondatastorage.googleapis.com/codeskulptor-assets/lathrop/nebula_blue.f2014.png"
 
 # splash image
 splash_info = ImageInfo([200, 150], [400, 300])
-splash_image = simplegui.load_image("http://commondatastorage.googleapis.com/codeskulptor-assets/lathrop/splash.png")
+splash_url = "http://commondatastorage.googleapis.com/codeskulptor-assets/lathrop/splash.png"
 
 # ship image
-ship_info = ImageInfo([45, 45], [90, 90], 35)
-ship_image = simplegui.load_image("http://commondatastorage.googleapis.com/codeskulptor-assets/lathrop/double_ship.png")
+ship_info = ImageInfo([45, 45], [90, 90], 35, frames = 2)
+ship_url = "http://commondatastorage.googleapis.com/codeskulptor-assets/lathrop/double_ship.png"
 
 # missile image - shot1.png, shot2.png, shot3.png
 missile_info = ImageInfo([5,5], [10, 10], 3, 50)
-missile_image = simplegui.load_image("http://commondatastorage.googleapis.com/codeskulptor-assets/lathrop/shot2.png")
+missile_url = "http://commondatastorage.googleapis.com/codeskulptor-assets/lathrop/shot2.png"
 
 # asteroid images - asteroid_blue.png, asteroid_brown.png, asteroid_blend.png
 asteroid_info = ImageInfo([45, 45], [90, 90], 40)
-asteroid_image = simplegui.load_image("http://commondatastorage.googleapis.com/codeskulptor-assets/lathrop/asteroid_blue.png")
+asteroid_url = "http://commondatastorage.googleapis.com/codeskulptor-assets/lathrop/asteroid_blue.png"
 
 # animated explosion - explosion_orange.png, explosion_blue.png, explosion_blue2.png, explosion_alpha.png
 explosion_info = ImageInfo([64, 64], [128, 128], 17, 24, True)
-explosion_image = simplegui.load_image("http://commondatastorage.googleapis.com/codeskulptor-assets/lathrop/explosion_alpha.png")
+explosion_url = "http://commondatastorage.googleapis.com/codeskulptor-assets/lathrop/explosion_alpha.png"
+
+# one atlas sheet for all of them when the images are cached locally (see
+# load_art in engine.py)
+(debris_image, nebula_image, splash_image, ship_image, missile_image, asteroid_image,
+ explosion_image) = load_art(load_image, [
+    (debris_url, debris_info), (nebula_url, nebula_info), (splash_url, splash_info),
+    (ship_url, ship_info), (missile_url, missile_info), (asteroid_url, asteroid_info),
+    (explosion_url, explosion_info)])
+
+# renders image layers into one new image for the background strip
+if make_compositor is not None:
+    background_compositor = make_compositor(load_image)
+else:
+    background_compositor = None
 
 # sound assets purchased from sounddogs.com, please do not redistribute
 # .ogg versions of sounds are also available, just replace .mp3 by .ogg
-soundtrack = simplegui.load_sound("http://commondatastorage.googleapis.com/codeskulptor-assets/sounddogs/soundtrack.mp3")
-missile_sound = simplegui.load_sound("http://commondatastorage.googleapis.com/codeskulptor-assets/sounddogs/missile.mp3")
-ship_thrust_sound = simplegui.load_sound("http://commondatastorage.googleapis.com/codeskulptor-assets/sounddogs/thrust.mp3")
-explosion_sound = simplegui.load_sound("http://commondatastorage.googleapis.com/codeskulptor-assets/sounddogs/explosion.mp3")
+# missiles and explosions get a few voices each (see Mixer)
+soundtrack = load_sound("http://commondatastorage.googleapis.com/codeskulptor-assets/sounddogs/soundtrack.mp3")
+missile_voices = load_voices("http://commondatastorage.googleapis.com/codeskulptor-assets/sounddogs/missile.mp3", 2)
+ship_thrust_sound = load_sound("http://commondatastorage.googleapis.com/codeskulptor-assets/sounddogs/thrust.mp3")
+explosion_voices = load_voices("http://commondatastorage.googleapis.com/codeskulptor-assets/sounddogs/explosion.mp3", 3)
+missile_sound = missile_voices[0]
+explosion_sound = explosion_voices[0]
 
 # alternative upbeat soundtrack by composer and former IIPP student Emiel Stopler
 # please do not redistribute without permission from Emiel at http://www.filmcomposer.nl
-#soundtrack = simplegui.load_sound("https://storage.googleapis.com/codeskulptor-assets/ricerocks_theme.mp3")
+#soundtrack = load_sound("https://storage.googleapis.com/codeskulptor-assets/ricerocks_theme.mp3")
 
 
 #-------------------------------------------------------------------
@@ -96,83 +169,444 @@ lives = 3
 time = 0
 started = False
 
+# most rocks on the field, and rocks added per rock_spawner call (once a
+# second) - set_stress_mode raises both for load testing
+ROCK_CAP = 12
+ROCKS_PER_SPAWN = 1
+
+# input journal - records every input event with its tick. replay.py
+# sets it on headless runs; a real session started with the environment
+# variable below set to a file name seeds the RNG, journals its input and
+# writes the journal to that file on exit, for replay.py play
+journal = None
+JOURNAL_VARIABLE = "RICEROCKS_JOURNAL"
+
+# draw buffer layers, drawn bottom to top
+LAYER_BACKGROUND = 0
+LAYER_HUD = 1
+LAYER_SHIP = 2
+LAYER_SPRITES = 3
+LAYER_SPLASH = 4
+LAYER_OVERLAY = 5
+
+# mixer - most sound (re)starts issued per frame, and sound priorities;
+# when more sounds are due than the budget allows the lowest go unplayed.
+# the budget is below the four sounds registered with the mixer, so a
+# frame with thrust, an explosion and a shot all due loses the shot
+MIXER_STARTS_PER_FRAME = 2
+PRIORITY_MUSIC = 3
+PRIORITY_THRUST = 2
+PRIORITY_EXPLOSION = 1
+PRIORITY_MISSILE = 0
+
+# frame profiler - frames kept per phase, how often the overlay text is
+# refreshed and where the timings go when the program exits
+PROFILE_FRAMES = 600
+PROFILE_OVERLAY_EVERY = 30
+PROFILE_FILE = "ricerocks_profile.csv"
+
+# preallocated sprites per pool, and what a pool does once all are live
+MISSILE_POOL_SIZE = 32
+EXPLOSION_POOL_SIZE = 32
+POOL_RECYCLE = "recycle"    # reuse the oldest live sprite
+POOL_DROP = "drop"          # refuse the new sprite
+
+# rotation cache - angles are snapped to this many steps per turn, and
+# the pre-rotated frames kept loaded may take up to this many bytes
+ROTATION_BUCKETS = 64
+ROTATION_BUDGET = 16 * 1024 * 1024
+
+# rock spawn placement - side of an occupancy grid cell, and the gap kept
+# between a new rock's edge and the ship's or another rock's edge (None
+# lets new rocks overlap the ones already there)
+SPAWN_CELL_SIZE = 25
+SPAWN_SHIP_CLEARANCE = 50
+SPAWN_ROCK_CLEARANCE = 10
+
+# widest a spatial hash cell gets, at least as wide as the biggest collision
+# pair, and the sprites a cell is sized to hold once the field is dense
+# enough for cells to shrink below that
+COLLISION_CELL_SIZE = 100
+HASH_CELL_FILL = 4
+
 #-------------------------------------------------------------------
 #-------------------------------------------------------------------
 
 
 # helper functions to handle transformations
-def angle_to_vector(ang):
-    return [math.cos(ang), math.sin(ang)]
+# shortest offset from q to p on the wrapped (toroidal) screen
+def wrapped_delta(p, q):
+    dx = (p[0] - q[0] + WIDTH / 2.0) % WIDTH - WIDTH / 2.0
+    dy = (p[1] - q[1] + HEIGHT / 2.0) % HEIGHT - HEIGHT / 2.0
+    return dx, dy
+
+# swept-circle test over the last tick: p and q are where the two objects
+# ended up after moving by v and u. the closest approach of their relative
+# path is checked, not just the end positions, so fast objects cannot pass
+# through each other between frames, and the wrapped offset lets objects
+# near opposite screen edges touch.
+def swept_collide(p, v, q, u, radius):
+    dx, dy = wrapped_delta(p, q)
+    wx = v[0] - u[0]
+    wy = v[1] - u[1]
+
+    # relative offset at the start of the tick, moving by w over t in [0, 1]
+    sx = dx - wx
+    sy = dy - wy
+    ww = wx * wx + wy * wy
+    if ww == 0:
+        t = 1.0
+    else:
+        t = min(1.0, max(0.0, -(sx * wx + sy * wy) / ww))
+
+    cx = sx + wx * t
+    cy = sy + wy * t
+    return cx * cx + cy * cy <= radius * radius
+
+def max_speed(sprite):
+    v = sprite.get_velocity()
+    return max(abs(v[0]), abs(v[1]))
+
+def record_event(kind, arg = None):
+    if journal is not None:
+        journal.record(time, kind, arg)
 
-def dist(p, q):
-    return math.sqrt((p[0] - q[0]) ** 2 + (p[1] - q[1]) ** 2)
+def start_journal(path):
+    global journal
+    journal = InputJournal(random.randrange(2 ** 32))
+    random.seed(journal.seed)
+    atexit.register(save_journal, path)
 
-def process_sprite_group(s_group, canvas):
-    for x in set(s_group):
-        x.draw(canvas)
+def save_journal(path):
+    journal.final = {"ticks": time, "score": score, "lives": lives}
+    journal.save(path)
+
+def release_sprite(sprite):
+    # give a pooled sprite back once it has left its group
+    if sprite.pool is not None:
+        sprite.pool.release(sprite)
+
+# canvas is None on frames the load governor skips drawing; frame_mask is
+# and-ed into an animated sprite's age to pick the frame it draws
+def process_sprite_group(s_group, canvas, frame_mask = -1):
+    if isinstance(s_group, SpriteStore):
+        if canvas is not None:
+            s_group.draw(canvas, frame_mask)
+        s_group.update()
+        return
+
+    for x in list(s_group):
+        if canvas is not None:
+            x.draw(canvas, frame_mask)
         if x.update():
             s_group.remove(x)
+            release_sprite(x)
 
             
-def group_collide(s_group, other_object):
+def group_collide(s_group, other_object, s_hash = None):
     has_collide = False
-    
-    for x in set(s_group):
+
+    # only sprites sharing a nearby cell with other_object can collide with it
+    if s_hash is None:
+        s_hash = SpatialHash(COLLISION_CELL_SIZE)
+        s_hash.rebuild(s_group)
+
+    reach = other_object.radius + max_speed(other_object)
+    for x in s_hash.query(other_object.get_position(), reach):
         if (x.collide(other_object)):
-            a_explosion = Sprite(x.get_position(), [0, 0], 0, 0, explosion_image, explosion_info, explosion_sound)
-            explosion_group.add(a_explosion)
+            explosion_pool.acquire(x.get_position(), [0, 0], 0, 0)
             s_group.remove(x)
+            s_hash.remove(x)
+            release_sprite(x)
             has_collide = True
 
     return has_collide
 
 
-def group_group_collide(group1, group2):
-    total_collisions = 0
-    
-    for x in set(group1):
-        if group_collide(group2, x):
-            group1.discard(x)
-            total_collisions += 1
-            
-    return total_collisions
-        
+# every member of group1 hit by a member of group2 is destroyed, along
+# with all of group2 that hit it, and the count of group1 members lost is
+# returned. a member of group2 goes to the first member of group1 (in
+# iteration order) it hits. the loop runs over whichever group's queries
+# into the other's hash are cheaper (see SpatialHash.query_cost) - a big
+# field of rocks with a few missiles usually costs one query per missile
+# rather than one per rock, unless the rocks move so fast that each
+# missile query would have to cover a wide area
+def group_group_collide(group1, group2, hash2 = None, hash1 = None):
+    if len(group1) == 0 or len(group2) == 0:
+        return 0
+
+    if hash1 is None:
+        hash1 = SpatialHash(COLLISION_CELL_SIZE)
+        hash1.rebuild(group1)
+    if hash2 is None:
+        hash2 = SpatialHash(COLLISION_CELL_SIZE)
+        hash2.rebuild(group2)
+
+    if hash1.query_cost(hash2) <= hash2.query_cost(hash1):
+        total_collisions = 0
+        for x in list(group1):
+            if group_collide(group2, x, hash2):
+                group1.discard(x)
+                hash1.remove(x)
+                release_sprite(x)
+                total_collisions += 1
+        return total_collisions
+
+    # hand each member of group2 to the first member of group1 it hits
+    order = {}
+    for i, x in enumerate(group1):
+        order[x] = i
+    hits = {}
+    for y in group2:
+        first = None
+        for x in hash1.query(y.get_position(), y.radius + max_speed(y)):
+            if y.collide(x) and (first is None or order[x] < order[first]):
+                first = x
+        if first is not None:
+            if first in hits:
+                hits[first].append(y)
+            else:
+                hits[first] = [y]
+
+    for x in sorted(hits, key=order.get):
+        for y in hits[x]:
+            explosion_pool.acquire(y.get_position(), [0, 0], 0, 0)
+            group2.remove(y)
+            hash2.remove(y)
+            release_sprite(y)
+        group1.discard(x)
+        hash1.remove(x)
+        release_sprite(x)
+    return len(hits)
+
+#-------------------------------------------------------------------
+
+# uniform grid over the wrapped world - sprites are bucketed by cell so a
+# collision test only looks at the cells around a position instead of the
+# whole group. cells tile the screen exactly and neighbours wrap around
+# the edges, like the sprites themselves do. each rebuild sizes the cells
+# to hold about HASH_CELL_FILL sprites (never wider than cell_size), so
+# the cells a query visits stay few however many sprites there are.
+class SpatialHash:
+
+    def __init__(self, cell_size, fill = HASH_CELL_FILL):
+        self.max_cell = cell_size
+        self.fill = fill
+        self.resize(0)
+        self.cells = {}
+        self.max_radius = 0
+        self.max_speed = 0
+        self.count = 0
+        self.total_reach = 0
+
+    def resize(self, count):
+        self.cols, self.rows = grid_shape(WIDTH, HEIGHT, count, self.fill, self.max_cell)
+        self.cell_width = float(WIDTH) / self.cols
+        self.cell_height = float(HEIGHT) / self.rows
+
+    def cell_of(self, pos):
+        return (int(pos[0] // self.cell_width) % self.cols,
+                int(pos[1] // self.cell_height) % self.rows)
+
+    def rebuild(self, s_group):
+        self.resize(len(s_group))
+        self.cells = {}
+        self.max_radius = 0
+        self.max_speed = 0
+        self.count = 0
+        self.total_reach = 0
+        if isinstance(s_group, SpriteStore):
+            self.rebuild_store(s_group)
+            return
+        for x in s_group:
+            self.insert(x)
+
+    # a SpriteStore's cells, largest radius and top speed come straight
+    # out of its arrays, with no per-sprite position reads
+    def rebuild_store(self, store):
+        n = store.count
+        if n == 0:
+            return
+        pos = store.pos[:n]
+        cols = (pos[:, 0] // self.cell_width).astype(int) % self.cols
+        rows = (pos[:, 1] // self.cell_height).astype(int) % self.rows
+        cells = self.cells
+        for x, key in zip(store.sprites, zip(cols.tolist(), rows.tolist())):
+            bucket = cells.get(key)
+            if bucket is None:
+                cells[key] = [x]
+            else:
+                bucket.append(x)
+        speeds = numpy.abs(store.vel[:n]).max(axis=1)
+        self.max_radius = float(store.radius[:n].max())
+        self.max_speed = float(speeds.max())
+        self.count = n
+        self.total_reach = float(store.radius[:n].sum() + speeds.sum())
+
+    def insert(self, sprite):
+        key = self.cell_of(sprite.get_position())
+        if key in self.cells:
+            self.cells[key].append(sprite)
+        else:
+            self.cells[key] = [sprite]
+        if sprite.radius > self.max_radius:
+            self.max_radius = sprite.radius
+        speed = max_speed(sprite)
+        if speed > self.max_speed:
+            self.max_speed = speed
+        self.count += 1
+        self.total_reach += sprite.radius + speed
+
+    # rough cost of querying other_hash once for every sprite hashed here:
+    # each query visits the cells within the sprite's radius and speed,
+    # widened by other_hash's largest radius and speed
+    def query_cost(self, other_hash):
+        if self.count == 0:
+            return 0
+        reach = self.total_reach / self.count + other_hash.max_radius + other_hash.max_speed
+        return self.count * (1 + other_hash.count * 4 * reach * reach / (WIDTH * HEIGHT))
+
+    def remove(self, sprite):
+        key = self.cell_of(sprite.get_position())
+        bucket = self.cells.get(key)
+        if bucket and sprite in bucket:
+            bucket.remove(sprite)
+
+    def wrapped_range(self, index, span, count):
+        # cell indices within span of index, each listed once even when
+        # the span is wider than the grid
+        if 2 * span + 1 >= count:
+            return range(count)
+        return [(index + d) % count for d in range(-span, span + 1)]
+
+    def query(self, pos, radius):
+        # every sprite whose cell lies within radius + max_radius of pos,
+        # widened by the fastest sprite's last move for swept tests
+        reach = radius + self.max_radius + self.max_speed
+        col, row = self.cell_of(pos)
+        cols = self.wrapped_range(col, int(math.ceil(reach / self.cell_width)), self.cols)
+        rows = self.wrapped_range(row, int(math.ceil(reach / self.cell_height)), self.rows)
+
+        found = []
+        for c in cols:
+            for r in rows:
+                bucket = self.cells.get((c, r))
+                if bucket:
+                    found.extend(bucket)
+        return found
+
+    def within(self, pos, radius):
+        # sprites whose centres lie within radius of pos, nearest first
+        col, row = self.cell_of(pos)
+        cols = self.wrapped_range(col, int(math.ceil(radius / self.cell_width)), self.cols)
+        rows = self.wrapped_range(row, int(math.ceil(radius / self.cell_height)), self.rows)
+
+        found = []
+        for c in cols:
+            for r in rows:
+                for x in self.cells.get((c, r), ()):
+                    dx, dy = wrapped_delta(x.get_position(), pos)
+                    d = dx * dx + dy * dy
+                    if d <= radius * radius:
+                        found.append((d, x))
+        found.sort(key=lambda item: item[0])
+        return [x for d, x in found]
+
+    def nearest(self, pos, k = 1):
+        # the k sprites closest to pos, nearest first (see grid_nearest)
+        def distance(x):
+            dx, dy = wrapped_delta(x.get_position(), pos)
+            return dx * dx + dy * dy
+        col, row = self.cell_of(pos)
+        found = grid_nearest(self.cells, col, row, self.cols, self.rows,
+                             min(self.cell_width, self.cell_height), k, distance)
+        return [x for d, x in found]
+
+#-------------------------------------------------------------------
+
+# occupancy grid for placing new rocks - a cell stays free while every
+# point in it is clear of the ship and of the rocks on the field, so a
+# spawn picks a random free cell and a random point inside it and never
+# has to retry. free cells are kept in a list with a back index, which
+# makes blocking one a swap-remove.
+class SpawnGrid:
+
+    def __init__(self, cell_size):
+        self.cols = max(1, int(WIDTH // cell_size))
+        self.rows = max(1, int(HEIGHT // cell_size))
+        self.cell_width = float(WIDTH) / self.cols
+        self.cell_height = float(HEIGHT) / self.rows
+        self.free = []
+        self.where = []
+
+    def clear(self):
+        self.free = list(range(self.cols * self.rows))
+        self.where = list(range(self.cols * self.rows))
+
+    def take(self, i):
+        w = self.where[i]
+        if w < 0:
+            return
+        last = self.free.pop()
+        if last != i:
+            self.free[w] = last
+            self.where[last] = w
+        self.where[i] = -1
+
+    def block(self, pos, radius):
+        # take every cell that comes closer than radius to pos
+        col = int(pos[0] // self.cell_width) % self.cols
+        row = int(pos[1] // self.cell_height) % self.rows
+        span_c = int(math.ceil(radius / self.cell_width))
+        span_r = int(math.ceil(radius / self.cell_height))
+        if 2 * span_c + 1 >= self.cols:
+            cols = range(self.cols)
+        else:
+            cols = [(col + d) % self.cols for d in range(-span_c, span_c + 1)]
+        if 2 * span_r + 1 >= self.rows:
+            rows = range(self.rows)
+        else:
+            rows = [(row + d) % self.rows for d in range(-span_r, span_r + 1)]
+
+        half_w = self.cell_width / 2
+        half_h = self.cell_height / 2
+        for c in cols:
+            for r in rows:
+                dx, dy = wrapped_delta([(c + .5) * self.cell_width, (r + .5) * self.cell_height], pos)
+                ex = max(0, abs(dx) - half_w)
+                ey = max(0, abs(dy) - half_h)
+                if ex * ex + ey * ey < radius * radius:
+                    self.take(r * self.cols + c)
+
+    def sample(self):
+        # a uniformly random clear position, or None when the field is full
+        if not self.free:
+            return None
+        i = self.free[random.randrange(len(self.free))]
+        c = i % self.cols
+        r = i // self.cols
+        return [(c + random.random()) * self.cell_width, (r + random.random()) * self.cell_height]
+
 #-------------------------------------------------------------------
 # Ship class
-class Ship:
+class Ship(Body):
+    __slots__ = ("thrust",)
 
     def __init__(self, pos, vel, angle, image, info):
-        self.pos = [pos[0], pos[1]]
-        self.vel = [vel[0], vel[1]]
+        Body.__init__(self, pos, vel, angle, 0, image, info)
         self.thrust = False
-        self.angle = angle
-        self.angle_vel = 0
-        self.image = image
-        self.image_center = info.get_center()
-        self.image_size = info.get_size()
-        self.radius = info.get_radius()
 
-    def get_position(self):
-        return self.pos
-
-    def get_radius(self):
-        return self.radius        
-        
     def draw(self,canvas):
         if self.thrust:
-            canvas.draw_image(self.image, [self.image_center[0] + self.image_size[0], self.image_center[1]] , self.image_size,
-                              self.pos, self.image_size, self.angle)
+            canvas.draw_image(self.image, self.frames[1], self.image_size,
+                              self.pos, self.image_size, self.angle, layer=LAYER_SHIP)
         else:
-            canvas.draw_image(self.image, self.image_center, self.image_size,
-                              self.pos, self.image_size, self.angle)
+            canvas.draw_image(self.image, self.frames[0], self.image_size,
+                              self.pos, self.image_size, self.angle, layer=LAYER_SHIP)
 
     def update(self):
-        # update angle
-        self.angle += self.angle_vel
-        
-        # update position
-        self.pos[0] = (self.pos[0] + self.vel[0]) % WIDTH
-        self.pos[1] = (self.pos[1] + self.vel[1]) % HEIGHT
+        # update angle and position
+        self.move(WIDTH, HEIGHT)
 
         # update velocity
         if self.thrust:
@@ -186,10 +620,9 @@ class Ship:
     def set_thrust(self, on):
         self.thrust = on
         if on:
-            ship_thrust_sound.rewind()
-            ship_thrust_sound.play()
+            mixer.play(ship_thrust_sound)
         else:
-            ship_thrust_sound.pause()
+            mixer.pause(ship_thrust_sound)
        
     def increment_angle_vel(self):
         self.angle_vel += .05
@@ -201,65 +634,554 @@ class Ship:
         forward = angle_to_vector(self.angle)
         missile_pos = [self.pos[0] + self.radius * forward[0], self.pos[1] + self.radius * forward[1]]
         missile_vel = [self.vel[0] + 6 * forward[0], self.vel[1] + 6 * forward[1]]
-        a_missile = Sprite(missile_pos, missile_vel, self.angle, 0, missile_image, missile_info, missile_sound)
-        
-        missile_group.add(a_missile)
+        missile_pool.acquire(missile_pos, missile_vel, self.angle, 0)
         
 #-------------------------------------------------------------------
 #-------------------------------------------------------------------
     
 # Sprite class
-class Sprite:
+class Sprite(Body):
+    __slots__ = ("lifespan", "animated", "age", "store", "slot", "pool", "generation")
+
     def __init__(self, pos, vel, ang, ang_vel, image, info, sound = None):
-        self.pos = [pos[0],pos[1]]
-        self.vel = [vel[0],vel[1]]
-        self.angle = ang
-        self.angle_vel = ang_vel
-        self.image = image
-        self.image_center = info.get_center()
-        self.image_size = info.get_size()
-        self.radius = info.get_radius()
-        self.lifespan = info.get_lifespan()
-        self.animated = info.get_animated()
+        Body.__init__(self, pos, vel, ang, ang_vel, image, info)
+        self.lifespan = info.lifespan
+        self.animated = info.animated
         self.age = 0
+        # set while the sprite lives in a SpriteStore, which then owns
+        # its position, velocity, angle and age
+        self.store = None
+        self.slot = -1
+        # set for sprites owned by a SpritePool, which bumps generation each
+        # time it hands the sprite out again - anything keyed on a sprite
+        # (e.g. the server's net ids) can tell one shot from the next
+        self.pool = None
+        self.generation = 0
         if sound:
-            sound.rewind()
-            sound.play()
+            mixer.play(sound)
 
+    def reset(self, pos, vel, ang, ang_vel, age = 0):
+        # reinitialise a recycled sprite in place
+        self.pos[0] = pos[0]
+        self.pos[1] = pos[1]
+        self.vel[0] = vel[0]
+        self.vel[1] = vel[1]
+        self.angle = ang
+        self.angle_vel = ang_vel
+        self.age = age
+
+    # a stored sprite reads its row out of the store's row lists, straight
+    # from the list once it has been made for this tick
     def get_position(self):
-        return self.pos
+        store = self.store
+        if store is None:
+            return self.pos
+        if store.positions is not None:
+            return store.positions[self.slot]
+        return store.position(self.slot)
 
-    def get_radius(self):
-        return self.radius
-        
-    def draw(self, canvas):
+    def get_velocity(self):
+        store = self.store
+        if store is None:
+            return self.vel
+        if store.velocities is not None:
+            return store.velocities[self.slot]
+        return store.velocity(self.slot)
+
+    def draw(self, canvas, frame_mask = -1):
         if self.animated:
-            canvas.draw_image(self.image, [self.image_center[0] + self.age*self.image_size[0] ,self.image_center[1]] , self.image_size,
+            canvas.draw_image(self.image, self.frames[self.age & frame_mask], self.image_size,
                               self.pos, self.image_size, self.angle)            
         else:    
             canvas.draw_image(self.image, self.image_center, self.image_size,
                               self.pos, self.image_size, self.angle)
 
     def update(self):
-        # update angle
+        # Body.move written out - this runs once per sprite per tick
         self.angle += self.angle_vel
-        
-        # update position
-        self.pos[0] = (self.pos[0] + self.vel[0]) % WIDTH
-        self.pos[1] = (self.pos[1] + self.vel[1]) % HEIGHT
+        pos, vel = self.pos, self.vel
+        pos[0] = (pos[0] + vel[0]) % WIDTH
+        pos[1] = (pos[1] + vel[1]) % HEIGHT
     
         self.age += 1    
         return (self.age >= self.lifespan)
            
         
     def collide(self,other_object):
-        return ( dist(self.get_position(), other_object.get_position()) <= (self.radius + other_object.radius) )
+        return swept_collide(self.get_position(), self.get_velocity(),
+                             other_object.get_position(), other_object.get_velocity(),
+                             self.radius + other_object.radius)
+
+#-------------------------------------------------------------------
+
+# array-backed sprite group - keeps every sprite's moving state in parallel
+# numpy arrays so a whole group is advanced with a handful of vector ops
+# instead of one Sprite.update call per object. it has the same add /
+# remove / discard / len / in / iteration interface as the sets it
+# replaces, and iterating it yields the Sprite objects themselves.
+class SpriteStore:
+
+    def __init__(self, capacity = 64):
+        self.count = 0
+        self.sprites = []
+        self.pos = numpy.zeros((capacity, 2))
+        self.vel = numpy.zeros((capacity, 2))
+        self.angle = numpy.zeros(capacity)
+        self.angle_vel = numpy.zeros(capacity)
+        self.age = numpy.zeros(capacity)
+        self.lifespan = numpy.zeros(capacity)
+        self.radius = numpy.zeros(capacity)
+        # pos / vel as lists of rows, made on the first per-sprite read
+        # after the arrays change (None until then)
+        self.positions = None
+        self.velocities = None
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self.sprites)
+
+    def __contains__(self, sprite):
+        return sprite.store is self
+
+    def grow(self):
+        capacity = 2 * len(self.angle)
+        for name in ("pos", "vel", "angle", "angle_vel", "age", "lifespan", "radius"):
+            old = getattr(self, name)
+            new = numpy.zeros((capacity,) + old.shape[1:])
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def add(self, sprite):
+        if sprite.store is self:
+            return
+        if self.count == len(self.angle):
+            self.grow()
+        i = self.count
+        self.pos[i] = sprite.pos
+        self.vel[i] = sprite.vel
+        self.angle[i] = sprite.angle
+        self.angle_vel[i] = sprite.angle_vel
+        self.age[i] = sprite.age
+        self.lifespan[i] = sprite.lifespan
+        self.radius[i] = sprite.radius
+        if self.positions is not None:
+            self.positions.append(self.pos[i].tolist())
+        if self.velocities is not None:
+            self.velocities.append(self.vel[i].tolist())
+        sprite.store = self
+        sprite.slot = i
+        self.sprites.append(sprite)
+        self.count += 1
+
+    def detach(self, sprite):
+        # hand the sprite its state back so it stays usable on its own
+        i = sprite.slot
+        sprite.pos = self.pos[i].tolist()
+        sprite.vel = self.vel[i].tolist()
+        sprite.angle = float(self.angle[i])
+        sprite.age = int(self.age[i])
+        sprite.store = None
+        sprite.slot = -1
+
+    def remove(self, sprite):
+        if sprite.store is not self:
+            raise KeyError(sprite)
+        self.discard(sprite)
+
+    def discard(self, sprite):
+        if sprite.store is not self:
+            return
+        i = sprite.slot
+        last = self.count - 1
+        self.detach(sprite)
+
+        # move the last row into the freed slot
+        if i != last:
+            for array in (self.pos, self.vel, self.angle, self.angle_vel, self.age, self.lifespan, self.radius):
+                array[i] = array[last]
+            for rows in (self.positions, self.velocities):
+                if rows is not None:
+                    rows[i] = rows[last]
+            moved = self.sprites[last]
+            moved.slot = i
+            self.sprites[i] = moved
+        for rows in (self.positions, self.velocities):
+            if rows is not None:
+                rows.pop()
+        self.sprites.pop()
+        self.count = last
+
+    def changed(self):
+        self.positions = None
+        self.velocities = None
+
+    # one sprite's position / velocity. the rows of the whole group are
+    # turned into lists once per update (add and discard keep them in step),
+    # so a pass that reads every sprite does not build a list per read
+    def position(self, i):
+        if self.positions is None:
+            self.positions = self.pos[:self.count].tolist()
+        return self.positions[i]
+
+    def velocity(self, i):
+        if self.velocities is None:
+            self.velocities = self.vel[:self.count].tolist()
+        return self.velocities[i]
+
+    def draw(self, canvas, frame_mask = -1):
+        n = self.count
+        positions = self.pos[:n].tolist()
+        angles = self.angle[:n].tolist()
+        ages = self.age[:n].tolist()
+        for i in range(n):
+            x = self.sprites[i]
+            if x.animated:
+                center = x.frames[int(ages[i]) & frame_mask]
+            else:
+                center = x.image_center
+            canvas.draw_image(x.image, center, x.image_size,
+                              positions[i], x.image_size, angles[i])
+
+    def update(self):
+        n = self.count
+        if n == 0:
+            return
+
+        self.angle[:n] += self.angle_vel[:n]
+        self.changed()
+
+        pos = self.pos[:n]
+        pos += self.vel[:n]
+        pos[:, 0] %= WIDTH
+        pos[:, 1] %= HEIGHT
+
+        self.age[:n] += 1
+
+        # drop every sprite that outlived its lifespan in one pass
+        expired = self.age[:n] >= self.lifespan[:n]
+        if expired.any():
+            keep = ~expired
+            dead = [self.sprites[i] for i in numpy.flatnonzero(expired).tolist()]
+            for x in dead:
+                self.detach(x)
+            for array in (self.pos, self.vel, self.angle, self.angle_vel, self.age, self.lifespan, self.radius):
+                kept = array[:n][keep]
+                array[:len(kept)] = kept
+            self.sprites = [x for x, k in zip(self.sprites, keep.tolist()) if k]
+            for i, x in enumerate(self.sprites):
+                x.slot = i
+            self.count = len(self.sprites)
+            for x in dead:
+                release_sprite(x)
+
+
+# insertion-ordered stand-in for a set, so sprites are visited (and
+# collide) in the same order on every run - replays depend on it
+class SpriteGroup:
+
+    def __init__(self):
+        self.members = {}
+
+    def __len__(self):
+        return len(self.members)
+
+    def __iter__(self):
+        return iter(self.members)
+
+    def __contains__(self, sprite):
+        return sprite in self.members
+
+    def add(self, sprite):
+        self.members[sprite] = None
+
+    def remove(self, sprite):
+        del self.members[sprite]
+
+    def discard(self, sprite):
+        self.members.pop(sprite, None)
+
+
+def new_sprite_group():
+    if numpy is not None:
+        return SpriteStore()
+    return SpriteGroup()
+
+#-------------------------------------------------------------------
+
+# fixed set of preallocated sprites of one kind - acquire() reinitialises
+# a free sprite in place and adds it to the group instead of building a
+# new Sprite, and sprites come back through release_sprite once they
+# leave the group. when every sprite is live the overflow policy either
+# recycles the oldest one or drops the request.
+class SpritePool:
+
+    def __init__(self, image, info, capacity, group, sound = None, overflow = POOL_RECYCLE):
+        self.free = []
+        for i in range(capacity):
+            a_sprite = Sprite([0, 0], [0, 0], 0, 0, image, info)
+            a_sprite.pool = self
+            self.free.append(a_sprite)
+        self.live = {}
+        self.capacity = capacity
+        self.group = group
+        self.sound = sound
+        self.overflow = overflow
+
+        # counters for sizing the pool
+        self.acquired = 0
+        self.recycled = 0
+        self.dropped = 0
+        self.high_water = 0
+
+    def acquire(self, pos, vel, ang, ang_vel, age = 0, quiet = False):
+        if self.free:
+            x = self.free.pop()
+        elif self.overflow == POOL_RECYCLE and self.live:
+            # live sprites are kept in acquisition order
+            for x in self.live:
+                break
+            del self.live[x]
+            self.group.discard(x)
+            self.recycled += 1
+        else:
+            self.dropped += 1
+            return None
+
+        x.reset(pos, vel, ang, ang_vel, age)
+        x.generation += 1
+        self.live[x] = None
+        self.acquired += 1
+        if len(self.live) > self.high_water:
+            self.high_water = len(self.live)
+
+        self.group.add(x)
+        if self.sound and not quiet:
+            mixer.play(self.sound)
+        return x
+
+    def release(self, sprite):
+        if sprite in self.live:
+            del self.live[sprite]
+            self.free.append(sprite)
+
+    def stats(self):
+        return {"capacity": self.capacity, "live": len(self.live),
+                "high_water": self.high_water, "acquired": self.acquired,
+                "recycled": self.recycled, "dropped": self.dropped}
+
+#-------------------------------------------------------------------
+
+# records one frame's draw calls instead of issuing them straight away.
+# images are grouped by layer and then by source image, and flush() sends
+# the whole frame to the real canvas in one pass, bottom layer first,
+# resolving each image (or skipping one still loading) once per group.
+# stats holds the command counts of the last flushed frame.
+class DrawBuffer:
+
+    def __init__(self):
+        self.images = {}
+        self.texts = {}
+        self.stats = {"images": 0, "texts": 0, "sources": 0, "skipped": 0}
+
+    def begin(self):
+        self.images = {}
+        self.texts = {}
+
+    # destinations are copied as they are recorded - callers pass their own
+    # pos lists, which move on before the buffer is flushed
+    def draw_image(self, image, center_source, size_source, center_dest, size_dest, rotation = 0, layer = LAYER_SPRITES):
+        groups = self.images.get(layer)
+        if groups is None:
+            groups = self.images[layer] = {}
+        commands = groups.get(image)
+        if commands is None:
+            commands = groups[image] = []
+        commands.append((center_source, size_source, [center_dest[0], center_dest[1]], size_dest, rotation))
+
+    def draw_text(self, text, point, font_size, font_color, font_face = "serif", layer = LAYER_HUD):
+        point = [point[0], point[1]]
+        if layer in self.texts:
+            self.texts[layer].append((text, point, font_size, font_color, font_face))
+        else:
+            self.texts[layer] = [(text, point, font_size, font_color, font_face)]
+
+    def flush(self, canvas):
+        images = texts = sources = skipped = 0
+        for layer in sorted(set(self.images) | set(self.texts)):
+            for command in self.texts.get(layer, ()):
+                canvas.draw_text(command[0], command[1], command[2], command[3], command[4])
+                texts += 1
+            for source, commands in self.images.get(layer, {}).items():
+                sources += 1
+                image = ready_image(source)
+                if image is None:
+                    skipped += len(commands)
+                    continue
+                for command in commands:
+                    frame = None
+                    if command[4] and rotation_cache is not None:
+                        frame = rotation_cache.get(source, command[0], command[1], command[4])
+                    if frame is None:
+                        canvas.draw_image(image, command[0], command[1], command[2], command[3], command[4])
+                    else:
+                        # a pre-rotated frame is larger than its source rect, the
+                        # destination grows with it
+                        size = [command[3][0] * frame[2][0] / command[1][0],
+                                command[3][1] * frame[2][1] / command[1][1]]
+                        canvas.draw_image(ready_image(frame[0]), frame[1], frame[2], command[2], size)
+                images += len(commands)
+        self.stats = {"images": images, "texts": texts, "sources": sources, "skipped": skipped}
+
+#-------------------------------------------------------------------
+
+# small mixer in front of the sound handles. play() only queues a start;
+# flush() runs once per frame and issues them, highest priority first
+# and at most MIXER_STARTS_PER_FRAME, so the audio work per frame stays
+# bounded however many collisions happen. a sound asked for several
+# times in one frame starts once, and each start takes the next of that
+# sound's voices (its voice cap), restarting the oldest when all are busy.
+class Mixer:
+
+    def __init__(self, starts_per_frame):
+        self.starts_per_frame = starts_per_frame
+        self.channels = {}
+        self.pending = {}
+        self.stats = {"started": 0, "coalesced": 0, "dropped": 0}
+
+    def add(self, sound, priority, voices = None):
+        if voices is None:
+            voices = [sound]
+        self.channels[sound] = [priority, voices, 0]
+
+    def play(self, sound):
+        if sound in self.pending:
+            self.stats["coalesced"] += 1
+        else:
+            self.pending[sound] = True
+
+    def pause(self, sound):
+        self.pending.pop(sound, None)
+        if sound in self.channels:
+            for voice in self.channels[sound][1]:
+                voice.pause()
+        else:
+            sound.pause()
+
+    def flush(self):
+        if not self.pending:
+            return
+        due = []
+        for sound in self.pending:
+            if sound not in self.channels:
+                self.add(sound, 0)
+            due.append((-self.channels[sound][0], len(due), sound))
+        due.sort()
+        self.pending = {}
+
+        for i in range(len(due)):
+            if i >= self.starts_per_frame:
+                self.stats["dropped"] += len(due) - i
+                break
+            channel = self.channels[due[i][2]]
+            voices = channel[1]
+            voice = voices[channel[2] % len(voices)]
+            channel[2] += 1
+            voice.rewind()
+            voice.play()
+            self.stats["started"] += 1
+
+#-------------------------------------------------------------------
+
+# optional per-phase timing of the draw loop. each lap() stores the time
+# since the previous lap in that phase's ring buffer of PROFILE_FRAMES
+# slots, so memory stays fixed however long the game runs. the overlay
+# shows p50 / p95 / p99 per phase in milliseconds and the last frames are
+# written to PROFILE_FILE on exit. off until enable() is called ('p' in
+# game toggles it together with the overlay).
+class FrameProfiler:
+
+    def __init__(self, phases, size = PROFILE_FRAMES):
+        self.phases = phases
+        self.size = size
+        self.samples = {}
+        for phase in phases:
+            self.samples[phase] = [0.0] * size
+        self.frames = 0
+        self.last = 0.0
+        self.enabled = False
+        self.overlay = False
+        self.overlay_lines = []
+        self.dump_registered = False
+
+    def enable(self, overlay = False):
+        self.enabled = True
+        self.overlay = overlay
+        if atexit is not None and not self.dump_registered:
+            atexit.register(self.dump, PROFILE_FILE)
+            self.dump_registered = True
+
+    def toggle(self):
+        if self.enabled:
+            self.enabled = False
+            self.overlay = False
+        else:
+            self.enable(True)
+
+    def start_frame(self):
+        if self.enabled:
+            self.last = clock()
+
+    def lap(self, phase):
+        if self.enabled:
+            now = clock()
+            self.samples[phase][self.frames % self.size] = now - self.last
+            self.last = now
+
+    def end_frame(self):
+        if self.enabled:
+            self.frames += 1
+
+    def percentiles(self, phase):
+        # p50, p95 and p99 of the frames in the buffer, in milliseconds
+        n = min(self.frames, self.size)
+        if n == 0:
+            return [0.0, 0.0, 0.0]
+        ordered = sorted(self.samples[phase][:n])
+        return [1000.0 * ordered[min(n - 1, int(q * n))] for q in (.50, .95, .99)]
+
+    def draw_overlay(self, canvas):
+        if not self.overlay:
+            return
+        if self.frames % PROFILE_OVERLAY_EVERY == 0 or not self.overlay_lines:
+            self.overlay_lines = ["phase        p50    p95    p99 (ms)"]
+            for phase in self.phases:
+                p50, p95, p99 = self.percentiles(phase)
+                self.overlay_lines.append("%-10s %6.2f %6.2f %6.2f" % (phase, p50, p95, p99))
+        for i in range(len(self.overlay_lines)):
+            canvas.draw_text(self.overlay_lines[i], [20, 130 + 16 * i], 14, "Yellow", "monospace", layer=LAYER_OVERLAY)
+
+    def dump(self, path):
+        # one row per buffered frame, oldest first
+        n = min(self.frames, self.size)
+        if n == 0:
+            return
+        out = open(path, "w")
+        out.write("frame," + ",".join(self.phases) + "\n")
+        for frame in range(self.frames - n, self.frames):
+            row = [str(frame)]
+            for phase in self.phases:
+                row.append("%.6f" % (1000.0 * self.samples[phase][frame % self.size]))
+            out.write(",".join(row) + "\n")
+        out.close()
 
 #-------------------------------------------------------------------
 #-------------------------------------------------------------------
 
 # key handlers to control ship   
 def keydown(key):
+    record_event("keydown", key)
     if key == simplegui.KEY_MAP['left']:
         my_ship.decrement_angle_vel()
     elif key == simplegui.KEY_MAP['right']:
@@ -268,8 +1190,11 @@ def keydown(key):
         my_ship.set_thrust(True)
     elif key == simplegui.KEY_MAP['space']:
         my_ship.shoot()
+    elif key == simplegui.KEY_MAP['p']:
+        profiler.toggle()
         
 def keyup(key):
+    record_event("keyup", key)
     if key == simplegui.KEY_MAP['left']:
         my_ship.increment_angle_vel()
     elif key == simplegui.KEY_MAP['right']:
@@ -283,6 +1208,7 @@ def keyup(key):
 # mouseclick handlers that reset UI and conditions whether splash image is drawn
 def click(pos):
     global started, lives, score
+    record_event("click", [pos[0], pos[1]])
     center = [WIDTH / 2, HEIGHT / 2]
     size = splash_info.get_size()
     inwidth = (center[0] - size[0] / 2) < pos[0] < (center[0] + size[0] / 2)
@@ -291,72 +1217,169 @@ def click(pos):
         started = True
         lives = 3
         score = 0
-        soundtrack.rewind()
-        soundtrack.play()
+        mixer.play(soundtrack)
 
         
 #-------------------------------------------------------------------
 #-------------------------------------------------------------------
+
+# start the rotation cache and turn the ship, rock and missile frames on
+# its worker; explosions (24 frames each) fill in as their angles come
+# up. it starts with the first drawn frame rather than at load, so a game
+# loaded only to be simulated (the env, the server, benchmarks) never
+# renders anything - headless runs switch it off with use_rotation_cache.
+# rotated frames are loaded on the cache's own worker long after the
+# asset loader has closed, so the cache loads them itself
+def start_rotation_cache():
+    global rotation_cache, use_rotation_cache
+    use_rotation_cache = False
+    rotation_cache = make_rotation_cache(simplegui.load_image, ROTATION_BUCKETS, ROTATION_BUDGET)
+    if rotation_cache is not None:
+        rotation_cache.prerender(ship_image, ship_info.get_frames(), ship_info.get_size())
+        rotation_cache.prerender(asteroid_image, [asteroid_info.get_center()], asteroid_info.get_size())
+        rotation_cache.prerender(missile_image, [missile_info.get_center()], missile_info.get_size())
+
 def draw(canvas):
     global time, started, lives, score, rock_group
+
+    governor.start_frame(clock())
+    profiler.start_frame()
+
+    # record the frame into the draw buffer, it reaches the canvas in one
+    # flush at the end. under heavy load the governor skips drawing every
+    # other frame - buffer is None then, the game still moves on and the
+    # canvas gets the last drawn frame again (frames are only recorded for
+    # that once the governor is close to skipping)
+    if not frame_recorder.calls or governor.render_frame():
+        buffer = frame_buffer
+        buffer.begin()
+    else:
+        buffer = None
     
     # animiate background
     time += 1
     wtime = (time / 4) % WIDTH
-    center = debris_info.get_center()
-    size = debris_info.get_size()
-    canvas.draw_image(nebula_image, nebula_info.get_center(), nebula_info.get_size(), [WIDTH / 2, HEIGHT / 2], [WIDTH, HEIGHT])
-    canvas.draw_image(debris_image, center, size, (wtime - WIDTH / 2, HEIGHT / 2), (WIDTH, HEIGHT))
-    canvas.draw_image(debris_image, center, size, (wtime + WIDTH / 2, HEIGHT / 2), (WIDTH, HEIGHT))
+    if buffer is not None:
+        background.draw(buffer, wtime, not governor.skip_debris())
+    profiler.lap("background")
 
     # draw UI
-    canvas.draw_text("Lives", [50, 50], 22, "White")
-    canvas.draw_text("Score", [680, 50], 22, "White")
-    canvas.draw_text(str(lives), [50, 80], 22, "White")
-    canvas.draw_text(str(score), [680, 80], 22, "White")
+    if buffer is not None:
+        buffer.draw_text("Lives", [50, 50], 22, "White")
+        buffer.draw_text("Score", [680, 50], 22, "White")
+        buffer.draw_text(str(lives), [50, 80], 22, "White")
+        buffer.draw_text(str(score), [680, 80], 22, "White")
+    profiler.lap("hud")
 
     # draw and update ship and sprites
-    my_ship.draw(canvas)    
+    if buffer is not None:
+        my_ship.draw(buffer)    
     my_ship.update()
+    profiler.lap("ship")
         
-    process_sprite_group(rock_group,canvas)
-    process_sprite_group(missile_group,canvas)
-    process_sprite_group(explosion_group,canvas)
+    process_sprite_group(rock_group,buffer)
+    profiler.lap("rocks")
+    process_sprite_group(missile_group,buffer)
+    profiler.lap("missiles")
+    process_sprite_group(explosion_group,buffer,governor.explosion_frame_mask())
+    profiler.lap("explosions")
+
+    # bucket the moved sprites once for this tick's collision passes
+    rock_hash.rebuild(rock_group)
+    missile_hash.rebuild(missile_group)
+    profiler.lap("hashing")
     
     # update lives
-    if group_collide(rock_group, my_ship):
+    if group_collide(rock_group, my_ship, rock_hash):
         lives -= 1
+    profiler.lap("ship_hits")
         
     # update score
-    score += group_group_collide(rock_group, missile_group)
+    score += group_group_collide(rock_group, missile_group, missile_hash, rock_hash)
+    profiler.lap("rock_hits")
      
     if lives == 0:
         started = False
-        rock_group = set()
+        rock_group = new_sprite_group()
+        rock_hash.rebuild(rock_group)
         
         
     # draw splash screen if not started
-    if not started:
-        canvas.draw_image(splash_image, splash_info.get_center(), 
+    if buffer is not None and not started:
+        buffer.draw_image(splash_image, splash_info.get_center(), 
                           splash_info.get_size(), [WIDTH / 2, HEIGHT / 2], 
-                          splash_info.get_size())
+                          splash_info.get_size(), layer=LAYER_SPLASH)
+
+    if buffer is not None:
+        if use_rotation_cache:
+            start_rotation_cache()
+        profiler.draw_overlay(buffer)
+        if governor.record_frame():
+            frame_recorder.begin(canvas)
+            buffer.flush(frame_recorder)
+        else:
+            frame_recorder.forget()
+            buffer.flush(canvas)
+    else:
+        frame_recorder.replay(canvas)
+    mixer.flush()
+    profiler.lap("render")
+    profiler.end_frame()
+    governor.end_frame(clock())
 
 #-------------------------------------------------------------------
 #-------------------------------------------------------------------
         
 # timer handler that spawns a rock    
-def rock_spawner():
+# rocks are kept clear of every ship in ships, my_ship unless given (the
+# multiplayer server passes its players' ships)
+def rock_spawner(ships = None):
+    record_event("spawn")
     
-    if started:
-        if len(rock_group) != 12:
-            rock_pos = [random.randrange(0, WIDTH), random.randrange(0, HEIGHT)]
-            
-            if not (dist(my_ship.get_position(), rock_pos) <= 10):
-                rock_vel = [(random.random() * .6 - .3) + score/5.0 , (random.random() * .6 - .3) + score/5.0]
-                rock_avel = random.random() * .2 - .1
-                a_rock = Sprite(rock_pos, rock_vel, 0, rock_avel, asteroid_image, asteroid_info)
+    if started and len(rock_group) < ROCK_CAP:
+        rock_radius = asteroid_info.get_radius()
+        spawn_grid.clear()
+        if ships is None:
+            ships = [my_ship]
+        for ship in ships:
+            spawn_grid.block(ship.get_position(), ship.get_radius() + rock_radius + SPAWN_SHIP_CLEARANCE)
+        if SPAWN_ROCK_CLEARANCE is not None:
+            for x in rock_group:
+                spawn_grid.block(x.get_position(), x.get_radius() + rock_radius + SPAWN_ROCK_CLEARANCE)
+
+        for i in range(ROCKS_PER_SPAWN):
+            if len(rock_group) >= ROCK_CAP:
+                break
+            rock_pos = spawn_grid.sample()
+            if rock_pos is None:
+                break
+
+            rock_vel = [(random.random() * .6 - .3) + score/5.0 , (random.random() * .6 - .3) + score/5.0]
+            rock_avel = random.random() * .2 - .1
+            a_rock = Sprite(rock_pos, rock_vel, 0, rock_avel, asteroid_image, asteroid_info)
+
+            rock_group.add(a_rock)
+            rock_hash.insert(a_rock)
+            if SPAWN_ROCK_CLEARANCE is not None:
+                spawn_grid.block(rock_pos, 2 * rock_radius + SPAWN_ROCK_CLEARANCE)
+
+# nearest-rock queries for homing missiles, threat warnings and bots. they
+# are answered from rock_hash, which draw rebuilds every tick and which
+# follows every rock added or destroyed in between
+def nearest_rocks(pos, k = 1):
+    return rock_hash.nearest(pos, k)
+
+def rocks_within(pos, radius):
+    return rock_hash.within(pos, radius)
 
-                rock_group.add(a_rock)
+# stress mode - a bigger field filled faster than the normal one rock a
+# second. a stress field is denser than rocks kept apart can pack, so by
+# default its rocks may overlap
+def set_stress_mode(rock_cap, rocks_per_spawn, rock_clearance = None):
+    global ROCK_CAP, ROCKS_PER_SPAWN, SPAWN_ROCK_CLEARANCE
+    ROCK_CAP = rock_cap
+    ROCKS_PER_SPAWN = rocks_per_spawn
+    SPAWN_ROCK_CLEARANCE = rock_clearance
 
 #-------------------------------------------------------------------
 #-------------------------------------------------------------------
@@ -368,9 +1391,35 @@ frame = simplegui.create_frame("Asteroids", WIDTH, HEIGHT)
 
 # initialize ship and two sprites
 my_ship = Ship([WIDTH / 2, HEIGHT / 2], [0, 0], 0, ship_image, ship_info)
-rock_group = set([])
-missile_group = set([])
-explosion_group = set([])
+rock_group = new_sprite_group()
+missile_group = new_sprite_group()
+explosion_group = new_sprite_group()
+missile_pool = SpritePool(missile_image, missile_info, MISSILE_POOL_SIZE, missile_group, missile_sound)
+explosion_pool = SpritePool(explosion_image, explosion_info, EXPLOSION_POOL_SIZE, explosion_group, explosion_sound)
+frame_buffer = DrawBuffer()
+frame_recorder = FrameRecorder()
+governor = LoadGovernor()
+mixer = Mixer(MIXER_STARTS_PER_FRAME)
+mixer.add(soundtrack, PRIORITY_MUSIC)
+mixer.add(ship_thrust_sound, PRIORITY_THRUST)
+mixer.add(explosion_sound, PRIORITY_EXPLOSION, explosion_voices)
+mixer.add(missile_sound, PRIORITY_MISSILE, missile_voices)
+background = BackgroundLayer(nebula_image, nebula_info, debris_image, debris_info, WIDTH, HEIGHT,
+                             background_compositor, LAYER_BACKGROUND)
+# every load has been requested (the background strip was the last) - let
+# the loader threads finish and exit
+if assets is not None:
+    assets.close()
+# the rotation cache starts with the first drawn frame (see draw)
+rotation_cache = None
+use_rotation_cache = make_rotation_cache is not None
+profiler = FrameProfiler(["background", "hud", "ship", "rocks", "missiles", "explosions",
+                          "hashing", "ship_hits", "rock_hits", "render"])
+rock_hash = SpatialHash(COLLISION_CELL_SIZE)
+missile_hash = SpatialHash(COLLISION_CELL_SIZE)
+spawn_grid = SpawnGrid(SPAWN_CELL_SIZE)
+if InputJournal is not None and atexit is not None and os is not None and os.environ.get(JOURNAL_VARIABLE):
+    start_journal(os.environ[JOURNAL_VARIABLE])
 #-------------------------------------------------------------------
 
 
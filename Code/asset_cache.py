@@ -0,0 +1,172 @@
+"""
+Offline, content-addressed cache for the CodeSkulptor asset URLs.
+Files are stored under their SHA-256 digest and a manifest maps each
+asset URL to its cached file, so the games can load images and sounds
+from disk without touching the network.
+
+    python asset_cache.py fill ~/codeskulptor-assets
+    python asset_cache.py verify
+"""
+
+from __future__ import annotations
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+from pathlib import Path
+from typing import Optional, Sequence
+from urllib.parse import urlparse
+
+# ------------------------------------------------------------------
+# Locations
+# ------------------------------------------------------------------
+
+CODE_DIR: Path = Path(__file__).resolve().parent
+CACHE_DIR: Path = Path(os.environ.get("ASSET_CACHE_DIR", CODE_DIR / ".asset_cache"))
+MANIFEST_NAME: str = "manifest.json"
+
+# any quoted asset URL inside a game script
+_ASSET_URL = re.compile(r"""["'](https?://[^"']+\.(?:png|jpg|jpeg|gif|mp3|ogg|wav))["']""")
+
+# ------------------------------------------------------------------
+# Manifest
+# ------------------------------------------------------------------
+
+_manifest: Optional[dict[str, dict]] = None
+
+
+def load_manifest(cache_dir: Path = CACHE_DIR) -> dict[str, dict]:
+    path = cache_dir / MANIFEST_NAME
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())
+
+
+def save_manifest(manifest: dict[str, dict], cache_dir: Path = CACHE_DIR) -> None:
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp = cache_dir / (MANIFEST_NAME + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    tmp.replace(cache_dir / MANIFEST_NAME)
+
+
+def resolve(url: str, strict: bool = False) -> str:
+    """
+    Return the cached file for an asset URL, or the URL itself when it is
+    not cached. With strict=True a cache miss raises KeyError instead.
+    The manifest is read once per process.
+    """
+    global _manifest
+    if _manifest is None:
+        _manifest = load_manifest()
+    entry = _manifest.get(url)
+    if entry is not None:
+        path = CACHE_DIR / entry["path"]
+        if path.exists():
+            return str(path)
+    if strict:
+        raise KeyError(f"Asset not cached: {url}")
+    return url
+
+# ------------------------------------------------------------------
+# Filling and checking the cache
+# ------------------------------------------------------------------
+
+def sha256_of(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def game_asset_urls(code_dir: Path = CODE_DIR) -> list[str]:
+    """Every asset URL referenced by the game scripts, in first-seen order."""
+    urls: dict[str, None] = {}
+    for script in sorted(code_dir.glob("*.py")):
+        for url in _ASSET_URL.findall(script.read_text(encoding="utf-8")):
+            urls[url] = None
+    return list(urls)
+
+
+def find_source(url: str, source_dir: Path) -> Optional[Path]:
+    """
+    Look for a URL's file under source_dir: first at the URL's own path
+    (a mirror of the bucket layout), then anywhere by file name.
+    """
+    url_path = urlparse(url).path.lstrip("/")
+    candidate = source_dir / url_path
+    if candidate.is_file():
+        return candidate
+    name = Path(url_path).name
+    for match in sorted(source_dir.rglob(name)):
+        if match.is_file():
+            return match
+    return None
+
+
+def store(source: Path, cache_dir: Path = CACHE_DIR) -> dict:
+    """Copy a file into the cache under its digest and return its manifest entry."""
+    digest = sha256_of(source)
+    relative = Path("objects") / digest[:2] / (digest + source.suffix.lower())
+    target = cache_dir / relative
+    if not target.exists():
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(source, target)
+    return {"sha256": digest, "path": relative.as_posix(), "size": target.stat().st_size}
+
+
+def fill(source_dir: Path, cache_dir: Path = CACHE_DIR) -> tuple[list[str], list[str]]:
+    """Cache every game asset found under source_dir; return (cached, missing) URLs."""
+    manifest = load_manifest(cache_dir)
+    cached, missing = [], []
+    for url in game_asset_urls():
+        source = find_source(url, source_dir)
+        if source is None:
+            missing.append(url)
+            continue
+        manifest[url] = store(source, cache_dir)
+        cached.append(url)
+    save_manifest(manifest, cache_dir)
+    return cached, missing
+
+
+def verify(cache_dir: Path = CACHE_DIR) -> list[str]:
+    """Return the URLs whose cached file is missing or no longer matches its digest."""
+    bad = []
+    for url, entry in load_manifest(cache_dir).items():
+        path = cache_dir / entry["path"]
+        if not path.exists() or sha256_of(path) != entry["sha256"]:
+            bad.append(url)
+    return bad
+
+# ------------------------------------------------------------------
+# CLI
+# ------------------------------------------------------------------
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Manage the offline asset cache.")
+    parser.add_argument("--cache", type=Path, default=CACHE_DIR, help="cache directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    fill_cmd = sub.add_parser("fill", help="cache the game assets found in a local directory")
+    fill_cmd.add_argument("source", type=Path)
+    sub.add_parser("verify", help="re-hash every cached file")
+    args = parser.parse_args(argv)
+
+    if args.command == "fill":
+        cached, missing = fill(args.source, args.cache)
+        print(f"cached {len(cached)} assets in {args.cache}")
+        for url in missing:
+            print(f"missing: {url}")
+    else:
+        bad = verify(args.cache)
+        for url in bad:
+            print(f"corrupt or missing: {url}")
+        if bad:
+            raise SystemExit(1)
+        print("all cached assets verified")
+
+
+if __name__ == "__main__":
+    main()
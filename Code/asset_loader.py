@@ -0,0 +1,85 @@
+"""
+Concurrent asset prefetch for the simplegui games.
+Every image and sound fetch is started at once on a thread pool and a
+lazy handle is returned immediately, so the frame can come up while the
+assets are still loading. Startup then takes as long as the slowest
+single asset instead of the sum of all of them.
+"""
+
+from __future__ import annotations
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+def _ignore(*args: Any, **kwargs: Any) -> None:
+    return None
+
+
+class LazyAsset:
+    """
+    Handle to an image or sound that may still be loading.
+    Method calls are forwarded to the asset once it is ready and are
+    ignored until then (a sound played before it loads stays silent).
+    """
+
+    def __init__(self, url: str, future: Future) -> None:
+        self.url = url
+        self.future = future
+
+    def ready(self) -> bool:
+        return self.future.done() and self.future.exception() is None
+
+    def get(self) -> Optional[Any]:
+        """The loaded asset, or None while it is loading or if it failed."""
+        if self.ready():
+            return self.future.result()
+        return None
+
+    def wait(self, timeout: Optional[float] = None) -> Any:
+        return self.future.result(timeout)
+
+    def __getattr__(self, name: str) -> Any:
+        asset = self.get()
+        if asset is None:
+            return _ignore
+        return getattr(asset, name)
+
+
+class AssetLoader:
+    """Start asset loads on a thread pool and hand out LazyAsset handles."""
+
+    def __init__(self, load_image: Callable[[str], Any], load_sound: Callable[[str], Any],
+                 max_workers: int = 16) -> None:
+        self.load_image = load_image
+        self.load_sound = load_sound
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="asset")
+        self.handles: list[LazyAsset] = []
+
+    def _submit(self, loader: Callable[[str], Any], url: str) -> LazyAsset:
+        handle = LazyAsset(url, self.executor.submit(loader, url))
+        self.handles.append(handle)
+        return handle
+
+    def image(self, url: str) -> LazyAsset:
+        return self._submit(self.load_image, url)
+
+    def sound(self, url: str) -> LazyAsset:
+        return self._submit(self.load_sound, url)
+
+    def close(self) -> None:
+        """No more assets will be requested; workers exit once the queue drains."""
+        self.executor.shutdown(wait=False)
+
+    def wait_all(self, timeout: Optional[float] = None) -> None:
+        for handle in self.handles:
+            handle.wait(timeout)
+
+    def pending(self) -> list[str]:
+        return [handle.url for handle in self.handles if not handle.future.done()]
+
+    @staticmethod
+    def resolve(asset: Any) -> Optional[Any]:
+        """The drawable object behind a handle (None while loading); other objects pass through."""
+        if isinstance(asset, LazyAsset):
+            return asset.get()
+        return asset
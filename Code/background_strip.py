@@ -0,0 +1,75 @@
+"""
+Compositor for the pre-composed scrolling backgrounds.
+Renders draw_image-style layers from locally cached image files into one
+new image with Pillow and loads it through simplegui, so a game can serve
+a background layer with a single blit. Composed images are kept on disk
+keyed by their inputs, so each strip is only rendered once.
+"""
+
+from __future__ import annotations
+import hashlib
+from pathlib import Path
+from typing import Any, Callable, Optional, Sequence
+
+try:
+    from PIL import Image
+except ImportError:
+    # without Pillow there is no compositor and games draw every layer
+    Image = None
+
+from asset_cache import CACHE_DIR
+
+COMPOSED_DIR: Path = CACHE_DIR / "composed"
+
+# (image, center_source, size_source, center_dest, size_dest), as passed to draw_image
+Layer = tuple[Any, Sequence[float], Sequence[float], Sequence[float], Sequence[float]]
+
+
+def image_path(image: Any) -> Optional[Path]:
+    """Local file behind a loaded image, if it came from one."""
+    url = getattr(image, "url", None)
+    if url and Path(url).is_file():
+        return Path(url)
+    return None
+
+
+def compose(width: int, height: int, layers: Sequence[Layer]) -> Optional[Path]:
+    """
+    Render the layers into a width x height PNG, transparent where no layer
+    covers it; None if an image is not local.
+    """
+    sources = [image_path(layer[0]) for layer in layers]
+    if Image is None or None in sources:
+        return None
+
+    key = repr((width, height, [(str(path), layer[1:]) for path, layer in zip(sources, layers)]))
+    target = COMPOSED_DIR / (hashlib.sha256(key.encode()).hexdigest() + ".png")
+    if target.exists():
+        return target
+
+    strip = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    for path, (_, center, size, dest_center, dest_size) in zip(sources, layers):
+        with Image.open(path) as source:
+            box = (round(center[0] - size[0] / 2), round(center[1] - size[1] / 2),
+                   round(center[0] + size[0] / 2), round(center[1] + size[1] / 2))
+            tile = source.convert("RGBA").crop(box).resize((round(dest_size[0]), round(dest_size[1])))
+        corner = (round(dest_center[0] - dest_size[0] / 2), round(dest_center[1] - dest_size[1] / 2))
+        strip.paste(tile, corner, tile)
+
+    COMPOSED_DIR.mkdir(parents=True, exist_ok=True)
+    strip.save(target)
+    return target
+
+
+def make_compositor(load_image: Callable[[str], Any]) -> Optional[Callable[[int, int, Sequence[Layer]], Any]]:
+    """A compositor that returns the composed image loaded with load_image, or None without Pillow."""
+    if Image is None:
+        return None
+
+    def compositor(width: int, height: int, layers: Sequence[Layer]) -> Any:
+        path = compose(width, height, layers)
+        if path is None:
+            return None
+        return load_image(str(path))
+
+    return compositor
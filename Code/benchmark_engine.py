@@ -0,0 +1,94 @@
+"""
+Micro-benchmark for the shared engine core.
+Times the per-sprite update cost and memory of the slotted RiceRocks
+Sprite against the dict-backed class it replaced.
+
+    python benchmark_engine.py --sprites 1000 --repeat 200
+"""
+
+from __future__ import annotations
+import argparse
+import random
+import time
+import tracemalloc
+from typing import Any, Callable, Sequence
+
+from engine import ImageInfo
+from headless_runner import load_game
+
+WIDTH: int = 800
+HEIGHT: int = 600
+
+
+class LegacySprite:
+    """The games' Sprite before engine.py: instance dict, no slots."""
+
+    def __init__(self, pos, vel, ang, ang_vel, image, info):
+        self.pos = [pos[0], pos[1]]
+        self.vel = [vel[0], vel[1]]
+        self.angle = ang
+        self.angle_vel = ang_vel
+        self.image = image
+        self.image_center = info.get_center()
+        self.image_size = info.get_size()
+        self.radius = info.get_radius()
+        self.lifespan = info.get_lifespan()
+        self.animated = info.get_animated()
+        self.age = 0
+        self.store = None
+        self.slot = -1
+        self.pool = None
+
+    def update(self):
+        self.angle += self.angle_vel
+        self.pos[0] = (self.pos[0] + self.vel[0]) % WIDTH
+        self.pos[1] = (self.pos[1] + self.vel[1]) % HEIGHT
+        self.age += 1
+        return (self.age >= self.lifespan)
+
+
+def make_sprites(cls: Callable[..., Any], count: int, info: ImageInfo, seed: int) -> list[Any]:
+    rng = random.Random(seed)
+    return [cls([rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT)], [rng.uniform(-2, 2), rng.uniform(-2, 2)],
+                0, rng.uniform(-.1, .1), None, info) for _ in range(count)]
+
+
+def update_cost(sprites: Sequence[Any], repeat: int, rounds: int = 5) -> float:
+    """Seconds per Sprite.update call, best of rounds."""
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for x in sprites:
+                x.update()
+        best = min(best, time.perf_counter() - start)
+    return best / (repeat * len(sprites))
+
+
+def bytes_per_sprite(cls: Callable[..., Any], count: int, info: ImageInfo, seed: int) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sprites = make_sprites(cls, count, info, seed)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / len(sprites)
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Time per-sprite update cost before and after the engine core.")
+    parser.add_argument("--sprites", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    game = load_game()
+    info = game.asteroid_info
+    print(f"{'':<22} {'ns/update':>10} {'bytes/sprite':>13}")
+    for name, cls in (("before (dict)", LegacySprite), ("after (engine slots)", game.Sprite)):
+        cost = update_cost(make_sprites(cls, args.sprites, info, args.seed), args.repeat)
+        size = bytes_per_sprite(cls, args.sprites, info, args.seed)
+        print(f"{name:<22} {cost * 1e9:>10.1f} {size:>13,.0f}")
+
+
+if __name__ == "__main__":
+    main()
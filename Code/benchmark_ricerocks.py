@@ -0,0 +1,103 @@
+"""
+Scaling benchmark for the RiceRocks sprite and collision paths.
+Sweeps rock and missile counts in stress mode on the headless backend and
+reports simulated ticks per second and memory per rock and per missile.
+
+    python benchmark_ricerocks.py --rocks 100 1000 10000 --missiles 0 100 1000
+"""
+
+from __future__ import annotations
+import argparse
+import random
+import time
+import tracemalloc
+from types import ModuleType
+from typing import Sequence
+
+from headless_runner import TickRunner, load_game
+
+# lives given to the ship so the game never ends during a measurement
+ENDLESS_LIVES: int = 10 ** 9
+
+
+def setup(rocks: int, missiles: int, seed: int) -> tuple[ModuleType, TickRunner]:
+    """A started game in stress mode with room for the requested sprite counts."""
+    game = load_game()
+    runner = TickRunner(game)
+    random.seed(seed)
+    game.set_stress_mode(rocks, rocks)
+    runner.press_start()
+    game.lives = ENDLESS_LIVES
+    # the pool must hold every live missile the sweep asks for
+    game.missile_pool = game.SpritePool(game.missile_image, game.missile_info,
+                                        max(missiles, 1), game.missile_group)
+    return game, runner
+
+
+def memory_per_rock(rocks: int, seed: int) -> float:
+    """Bytes allocated per rock while the spawner fills an empty field."""
+    game, _ = setup(rocks, 0, seed)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    game.rock_spawner()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / max(1, len(game.rock_group))
+
+
+def memory_per_missile(missiles: int, seed: int) -> float:
+    """
+    Bytes allocated per missile for a pool of that size, counting the
+    pool's preallocated sprites and every missile acquired from it.
+    """
+    game, _ = setup(0, 0, seed)
+    rng = random.Random(seed)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    pool = game.SpritePool(game.missile_image, game.missile_info, missiles, game.missile_group)
+    for _ in range(missiles):
+        pool.acquire([rng.uniform(0, game.WIDTH), rng.uniform(0, game.HEIGHT)],
+                     [rng.uniform(-6, 6), rng.uniform(-6, 6)], 0, 0, quiet=True)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / max(1, len(game.missile_group))
+
+
+def ticks_per_second(rocks: int, missiles: int, ticks: int, seed: int) -> float:
+    """Simulated ticks per second with the field kept at the requested counts."""
+    game, runner = setup(rocks, missiles, seed)
+    game.rock_spawner()
+    rng = random.Random(seed)
+    width, height = game.WIDTH, game.HEIGHT
+
+    start = time.perf_counter()
+    for _ in range(ticks):
+        # keep the missile count up; destroyed rocks come back on the next spawn
+        for _ in range(missiles - len(game.missile_group)):
+            game.missile_pool.acquire([rng.uniform(0, width), rng.uniform(0, height)],
+                                      [rng.uniform(-6, 6), rng.uniform(-6, 6)], 0, 0)
+        runner.step()
+    return ticks / (time.perf_counter() - start)
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Sweep RiceRocks rock and missile counts.")
+    parser.add_argument("--rocks", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--missiles", type=int, nargs="+", default=[0, 100, 1000])
+    parser.add_argument("--ticks", type=int, default=200, help="ticks measured per configuration")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    per_missile = {missiles: memory_per_missile(missiles, args.seed)
+                   for missiles in args.missiles if missiles}
+    print(f"{'rocks':>7} {'missiles':>9} {'ticks/s':>10} {'bytes/rock':>11} {'bytes/missile':>14}")
+    for rocks in args.rocks:
+        per_rock = memory_per_rock(rocks, args.seed)
+        for missiles in args.missiles:
+            rate = ticks_per_second(rocks, missiles, args.ticks, args.seed)
+            missile_bytes = f"{per_missile[missiles]:,.0f}" if missiles else "-"
+            print(f"{rocks:>7} {missiles:>9} {rate:>10,.0f} {per_rock:>11,.0f} {missile_bytes:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+#-------------------------------------------------------------------
+# shared core of the Spaceship and RiceRocks games - ImageInfo, the
+# vector helpers, the Body base class of ships and sprites and the
+# scrolling BackgroundLayer live here once instead of being copied into
+# each game. the classes declare
+# __slots__ so their instances carry no attribute dict, and ImageInfo
+# works out its frame table once when it is built. LoadGovernor steps
+# drawing quality down and back up with the measured frame time, and
+# load_art loads the games' images, out of one atlas sheet when it can.
+#
+# written in the games' own dialect (no annotations, no f-strings) so it
+# loads under every Python the games do
+import math
+
+# the optional helpers below are written for Python 3.7+ - under an older
+# Python (2.7 included) importing one is a SyntaxError, and the games run
+# without it just as when the file is missing
+try:
+    import asset_cache
+except (ImportError, SyntaxError):
+    # asset_cache.py not alongside the games - load straight from the URLs
+    asset_cache = None
+
+try:
+    from texture_atlas import make_atlas
+except (ImportError, SyntaxError):
+    # no atlas builder - every image stays its own bitmap
+    make_atlas = None
+
+#-------------------------------------------------------------------
+
+# serve an asset from the local cache when there is one, else from its URL
+def asset_url(url):
+    if asset_cache is not None:
+        return asset_cache.resolve(url)
+    return url
+
+# a game's images, one per (url, info) pair in art and in the same order.
+# with every image in a local file they are packed into one atlas sheet
+# (texture_atlas.py, packed once and kept on disk) and only the sheet is
+# loaded - each ImageInfo moves onto its region and every draw uses the
+# one bitmap. otherwise each image is loaded on its own. load_image is
+# handed the cached path (or the URL) of each image
+def load_art(load_image, art):
+    if make_atlas is not None:
+        sheet = make_atlas(load_image, [(asset_url(url), info) for url, info in art])
+        if sheet is not None:
+            return [sheet] * len(art)
+    return [load_image(asset_url(url)) for url, info in art]
+
+#-------------------------------------------------------------------
+
+# helper functions to handle transformations
+def angle_to_vector(ang):
+    return [math.cos(ang), math.sin(ang)]
+
+def dist(p, q):
+    return math.sqrt((p[0] - q[0]) ** 2 + (p[1] - q[1]) ** 2)
+
+#-------------------------------------------------------------------
+
+# where an image's frames sit on its sheet, plus its collision radius,
+# lifespan and whether it animates. frames holds the source centre of
+# every frame, laid out left to right from center, so draws index it
+# instead of working the rect out each time
+class ImageInfo(object):
+    __slots__ = ("center", "size", "radius", "lifespan", "animated", "frame_count", "frames")
+
+    def __init__(self, center, size, radius = 0, lifespan = None, animated = False, frames = 1):
+        self.center = center
+        self.size = size
+        self.radius = radius
+        if lifespan:
+            self.lifespan = lifespan
+        else:
+            self.lifespan = float('inf')
+        self.animated = animated
+        if animated:
+            frames = lifespan
+        self.frame_count = frames
+        self.frames = self.frame_table()
+
+    def frame_table(self):
+        return [[self.center[0] + i * self.size[0], self.center[1]] for i in range(self.frame_count)]
+
+    # the image now sits at origin inside a bigger sheet (texture_atlas.py)
+    def place(self, origin):
+        self.center = [self.center[0] + origin[0], self.center[1] + origin[1]]
+        self.frames = self.frame_table()
+
+    def get_center(self):
+        return self.center
+
+    def get_size(self):
+        return self.size
+
+    def get_radius(self):
+        return self.radius
+
+    def get_lifespan(self):
+        return self.lifespan
+
+    def get_animated(self):
+        return self.animated
+
+    def get_frames(self):
+        return self.frames
+
+#-------------------------------------------------------------------
+
+# anything drawn from an ImageInfo that moves and spins on the wrapped
+# screen. the games subclass it for their ships and sprites, and each
+# subclass declares its own __slots__ to stay dict-free
+class Body(object):
+    __slots__ = ("pos", "vel", "angle", "angle_vel", "image", "image_center", "image_size",
+                 "frames", "radius")
+
+    def __init__(self, pos, vel, angle, angle_vel, image, info):
+        self.pos = [pos[0], pos[1]]
+        self.vel = [vel[0], vel[1]]
+        self.angle = angle
+        self.angle_vel = angle_vel
+        self.image = image
+        self.image_center = info.center
+        self.image_size = info.size
+        self.frames = info.frames
+        self.radius = info.radius
+
+    def get_position(self):
+        return self.pos
+
+    def get_velocity(self):
+        return self.vel
+
+    def get_radius(self):
+        return self.radius
+
+    # spin and move by one step, wrapping around the screen edges
+    def move(self, width, height):
+        self.angle += self.angle_vel
+        pos = self.pos
+        vel = self.vel
+        pos[0] = (pos[0] + vel[0]) % width
+        pos[1] = (pos[1] + vel[1]) % height
+
+#-------------------------------------------------------------------
+
+# wrapped uniform grids, shared by the RiceRocks SpatialHash and the
+# multiplayer server's InterestGrid. cells are sized to the population so
+# each holds about fill entries however dense the field gets (never wider
+# than max_side), which keeps a nearest search to the few cells around
+# its answer
+
+# columns and rows of a width x height grid for count entries
+def grid_shape(width, height, count, fill, max_side = None):
+    side = math.sqrt(float(width) * height * fill / max(1, count))
+    if max_side is not None and side > max_side:
+        side = max_side
+    return max(1, int(width // side)), max(1, int(height // side))
+
+# cells exactly k steps (in either direction) from (col, row), wrapped and
+# listed once each
+def grid_ring(col, row, k, cols, rows):
+    if k == 0:
+        return set([(col, row)])
+    cells = set()
+    for d in range(-k, k + 1):
+        cells.add(((col + d) % cols, (row - k) % rows))
+        cells.add(((col + d) % cols, (row + k) % rows))
+        cells.add(((col - k) % cols, (row + d) % rows))
+        cells.add(((col + k) % cols, (row + d) % rows))
+    return cells
+
+# the k entries of cells nearest to a point in cell (col, row), as
+# (squared distance, entry) pairs nearest first. distance(entry) gives an
+# entry's squared distance from the point and side is the shorter cell
+# side; entries further than limit (a squared distance) are left out.
+# rings of cells are searched outwards until no unvisited cell can hold
+# anything closer than the k-th best so far
+def grid_nearest(cells, col, row, cols, rows, side, k, distance, limit = None):
+    seen = set()
+    found = []
+    for steps in range(max(cols, rows) // 2 + 2):
+        # everything in this ring is at least reach away
+        reach = max(0, steps - 1) * side
+        if limit is not None and reach * reach > limit:
+            break
+        if len(found) >= k and reach * reach >= found[k - 1][0]:
+            break
+        for key in grid_ring(col, row, steps, cols, rows) - seen:
+            seen.add(key)
+            for entry in cells.get(key, ()):
+                d = distance(entry)
+                if limit is None or d <= limit:
+                    found.append((d, entry))
+        found.sort(key=lambda item: item[0])
+        del found[k:]
+    return found
+
+#-------------------------------------------------------------------
+
+# the scrolling background - a static nebula under two copies of the
+# debris image sliding right by wtime. with a compositor
+# (background_strip.py) the two debris copies are composed into a
+# transparent strip two screens wide when the layer is made, and each
+# frame is the nebula plus a single offset blit out of the strip; without
+# one the three blits are issued from parameters worked out once. the
+# nebula does not tile, so it stays out of the strip and never scrolls.
+# the compositor works from the debris image's file, so the image may
+# still be loading. layer, when given, is passed on to draw_image for a
+# canvas that sorts draws into layers
+class BackgroundLayer(object):
+
+    def __init__(self, nebula_image, nebula_info, debris_image, debris_info, width, height,
+                 compositor = None, layer = None):
+        self.nebula_image = nebula_image
+        self.nebula_center = nebula_info.get_center()
+        self.nebula_size = nebula_info.get_size()
+        self.debris_image = debris_image
+        self.debris_center = debris_info.get_center()
+        self.debris_size = debris_info.get_size()
+        self.width = width
+        self.height = height
+        self.screen_center = [width / 2, height / 2]
+        self.screen_size = [width, height]
+        self.layer = layer
+        self.strip = None
+        if compositor is not None:
+            layers = []
+            for x in (width / 2, 3 * width / 2):
+                layers.append((debris_image, self.debris_center, self.debris_size, [x, height / 2], self.screen_size))
+            self.strip = compositor(2 * width, height, layers)
+
+    def blit(self, canvas, image, center_source, size_source, center_dest, size_dest):
+        if self.layer is None:
+            canvas.draw_image(image, center_source, size_source, center_dest, size_dest)
+        else:
+            canvas.draw_image(image, center_source, size_source, center_dest, size_dest, 0, layer=self.layer)
+
+    # without debris (the load governor's first cut) only the nebula is drawn
+    def draw(self, canvas, wtime, debris = True):
+        self.blit(canvas, self.nebula_image, self.nebula_center, self.nebula_size,
+                  self.screen_center, self.screen_size)
+        if not debris:
+            return
+        width = self.width
+        height = self.height
+        if self.strip is not None:
+            self.blit(canvas, self.strip, [3 * width / 2 - wtime, height / 2], self.screen_size,
+                      self.screen_center, self.screen_size)
+        else:
+            self.blit(canvas, self.debris_image, self.debris_center, self.debris_size,
+                      (wtime - width / 2, height / 2), self.screen_size)
+            self.blit(canvas, self.debris_image, self.debris_center, self.debris_size,
+                      (wtime + width / 2, height / 2), self.screen_size)
+
+#-------------------------------------------------------------------
+
+# load governor quality levels, lowest load last; each level keeps the
+# cuts of the ones before it
+FULL_QUALITY = 0
+SKIP_DEBRIS = 1         # no debris layers in the background
+SHORT_EXPLOSIONS = 2    # explosions draw every other animation frame
+ALTERNATE_FRAMES = 3    # run the drawing code every other frame, simulate every frame
+LEVEL_NAMES = ("full", "skip debris", "short explosions", "alternate frames")
+
+# seconds of work a draw handler call may take before the load governor
+# starts cutting quality - leaves the browser some of a 60 fps frame
+FRAME_BUDGET = .012
+
+# picks a quality level from measured frame times. the time each draw
+# handler call takes is smoothed into a moving average; while it is over
+# budget the level steps down one at a time, at least settle frames
+# apart so each cut shows in the average before the next. once the
+# average drops under headroom * budget and has stayed at the level for
+# hold frames the level steps back up. a step up that has to be undone
+# before hold frames pass doubles hold (up to max_hold), so a load that
+# sits right at a threshold does not flip the level back and forth.
+class LoadGovernor(object):
+
+    def __init__(self, budget = FRAME_BUDGET, smoothing = .1, headroom = .6, settle = 30, hold = 120, max_hold = 1920):
+        self.budget = budget
+        self.smoothing = smoothing
+        self.headroom = headroom
+        self.settle = settle
+        self.min_hold = hold
+        self.hold = hold
+        self.max_hold = max_hold
+        self.level = FULL_QUALITY
+        self.average = 0.0
+        self.since_change = 0
+        self.raised = False
+        self.pinned = False
+        self.started = 0.0
+        self.frames = 0
+        self.skipped = 0
+        self.changes = 0
+
+    def start_frame(self, now):
+        self.started = now
+        self.frames += 1
+
+    # feed the frame's duration in and move the level if it is due
+    def end_frame(self, now):
+        self.average += self.smoothing * (now - self.started - self.average)
+        self.since_change += 1
+        if self.pinned:
+            return
+        if self.average > self.budget:
+            if self.level < ALTERNATE_FRAMES and self.since_change >= self.settle:
+                if self.raised and self.since_change < self.hold:
+                    self.hold = min(2 * self.hold, self.max_hold)
+                self.set_level(self.level + 1)
+                self.raised = False
+        elif self.average < self.headroom * self.budget:
+            if self.level > FULL_QUALITY and self.since_change >= self.hold:
+                if self.raised:
+                    self.hold = self.min_hold
+                self.set_level(self.level - 1)
+                self.raised = True
+
+    def set_level(self, level):
+        self.level = level
+        self.since_change = 0
+        self.changes += 1
+
+    # hold the level whatever the frame times say (e.g. a headless run,
+    # whose frame times reflect the host rather than a display)
+    def pin(self, level = FULL_QUALITY):
+        self.level = level
+        self.pinned = True
+
+    def skip_debris(self):
+        return self.level >= SKIP_DEBRIS
+
+    # and-ed into an explosion's age to pick the frame it draws - under
+    # SHORT_EXPLOSIONS each frame is held for two ticks. only the drawing
+    # changes, explosions still age (and expire) one tick at a time
+    def explosion_frame_mask(self):
+        if self.level >= SHORT_EXPLOSIONS:
+            return ~1
+        return -1
+
+    # whether this frame's draw calls should be kept for a FrameRecorder to
+    # replay - only from SHORT_EXPLOSIONS up, the one level ALTERNATE_FRAMES
+    # can be reached from; below it every draw goes straight to the canvas
+    def record_frame(self):
+        return self.level >= SHORT_EXPLOSIONS
+
+    # whether this frame is drawn; skipped frames are counted. a skipped
+    # frame replays the last drawn one, so the canvas still does the same
+    # blits - ALTERNATE_FRAMES cuts the draw handler's own time (building
+    # and sorting the frame), not the rendering work
+    def render_frame(self):
+        if self.level < ALTERNATE_FRAMES or self.frames % 2 == 0:
+            return True
+        self.skipped += 1
+        return False
+
+    def stats(self):
+        return {"level": LEVEL_NAMES[self.level], "average_ms": round(1000 * self.average, 3),
+                "changes": self.changes, "skipped": self.skipped}
+
+# canvas stand-in that passes draw_image / draw_text calls on to the real
+# canvas and keeps them, so a frame the governor skips can show the last
+# drawn one again without running any of the drawing code. destinations
+# are copied as they are kept, since the lists passed in are the sprites'
+# own positions and move on every tick. frames are only recorded while the
+# governor's record_frame says so; forget drops the last one otherwise
+class FrameRecorder(object):
+    __slots__ = ("canvas", "calls")
+
+    def __init__(self):
+        self.canvas = None
+        self.calls = []
+
+    def begin(self, canvas):
+        self.canvas = canvas
+        self.calls = []
+
+    def forget(self):
+        self.calls = []
+
+    def draw_image(self, image, center_source, size_source, center_dest, size_dest, rotation = 0):
+        self.calls.append((True, (image, center_source, size_source, [center_dest[0], center_dest[1]],
+                                  size_dest, rotation)))
+        self.canvas.draw_image(image, center_source, size_source, center_dest, size_dest, rotation)
+
+    def draw_text(self, text, point, font_size, font_color, font_face = "serif"):
+        self.calls.append((False, (text, [point[0], point[1]], font_size, font_color, font_face)))
+        self.canvas.draw_text(text, point, font_size, font_color, font_face)
+
+    def replay(self, canvas):
+        for image, args in self.calls:
+            if image:
+                canvas.draw_image(*args)
+            else:
+                canvas.draw_text(*args)
@@ -0,0 +1,175 @@
+"""
+Fast-forward tick runner for the simplegui games.
+Loads a game against the headless simplegui backend and advances its draw
+handler and timers tick by tick, as fast as the CPU allows, instead of
+waiting for the 60 Hz frame timer.
+
+    python headless_runner.py --ticks 1000000
+"""
+
+from __future__ import annotations
+import argparse
+import importlib.util
+import sys
+import time
+from pathlib import Path
+from types import ModuleType
+from typing import Sequence
+
+import simplegui_headless
+
+# ------------------------------------------------------------------
+# Loading
+# ------------------------------------------------------------------
+
+CODE_DIR: Path = Path(__file__).resolve().parent
+RICEROCKS_PATH: Path = CODE_DIR / "8- Asteroids-RiceRocks.py"
+
+# simplegui redraws the canvas 60 times a second; timers are converted
+# from milliseconds to ticks at this rate
+FRAME_RATE: int = 60
+
+_loaded_games = 0
+
+
+def load_game(path: Path = RICEROCKS_PATH) -> ModuleType:
+    """
+    Import a fresh copy of a game script with simplegui swapped for the
+    headless backend. Every call returns an independent module, so each
+    run starts from the script's initial state.
+    """
+    global _loaded_games
+    _loaded_games += 1
+    name = f"headless_game_{_loaded_games}"
+
+    if str(CODE_DIR) not in sys.path:
+        sys.path.insert(0, str(CODE_DIR))
+
+    saved = sys.modules.get("simplegui")
+    sys.modules["simplegui"] = simplegui_headless
+    try:
+        spec = importlib.util.spec_from_file_location(name, path)
+        game = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(game)
+    finally:
+        if saved is None:
+            del sys.modules["simplegui"]
+        else:
+            sys.modules["simplegui"] = saved
+    return game
+
+# ------------------------------------------------------------------
+# Runner
+# ------------------------------------------------------------------
+
+class TickRunner:
+    """Drive a headless game's frame and timers one tick at a time."""
+
+    def __init__(self, game: ModuleType) -> None:
+        self.game = game
+        self.frame = game.frame
+        self.canvas = simplegui_headless.NullCanvas()
+        self.tick = 0
+        self.timers = [(timer, max(1, round(timer.interval * FRAME_RATE / 1000.0)))
+                       for timer in vars(game).values()
+                       if isinstance(timer, simplegui_headless.HeadlessTimer)]
+        # games on a fixed physics step read the time through frame_clock;
+        # run that off the tick count so a fast-forward still steps each tick
+        if hasattr(game, "frame_clock"):
+            game.frame_clock = self.clock
+        # a fast-forward runs flat out, so its frame times say nothing about
+        # a display; keep games with a load governor at full quality so
+        # runs do not depend on how busy the host is
+        governor = getattr(game, "governor", None)
+        if governor is not None:
+            governor.pin()
+        # nothing is displayed, so there is nothing to pre-rotate sprites for
+        if hasattr(game, "use_rotation_cache"):
+            game.use_rotation_cache = False
+
+    def clock(self) -> float:
+        return self.tick / FRAME_RATE
+
+    # --- input events, delivered through the frame's handlers ---
+
+    def keydown(self, key: int) -> None:
+        self.frame.keydown_handler(key)
+
+    def keyup(self, key: int) -> None:
+        self.frame.keyup_handler(key)
+
+    def click(self, pos: Sequence[float]) -> None:
+        self.frame.mouseclick_handler(pos)
+
+    def press_start(self) -> None:
+        """
+        Click the middle of the canvas, where the splash screen sits.
+        Games without a mouse handler (Spaceship) start on their own.
+        """
+        if self.frame.mouseclick_handler is None:
+            return
+        self.click((self.frame.width / 2, self.frame.height / 2))
+
+    # --- ticking ---
+
+    def step(self) -> None:
+        """Draw one frame, then fire every timer that is due on this tick."""
+        self.frame.draw_handler(self.canvas)
+        self.tick += 1
+        for timer, period in self.timers:
+            if timer.running and self.tick % period == 0:
+                timer.handler()
+
+    def run(self, ticks: int) -> None:
+        """Advance the game by the given number of ticks."""
+        draw = self.frame.draw_handler
+        canvas = self.canvas
+        timers = self.timers
+        tick = self.tick
+        for _ in range(ticks):
+            draw(canvas)
+            tick += 1
+            self.tick = tick
+            for timer, period in timers:
+                if timer.running and tick % period == 0:
+                    timer.handler()
+
+# ------------------------------------------------------------------
+# CLI
+# ------------------------------------------------------------------
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Run a simplegui game headless, as fast as possible.")
+    parser.add_argument("--game", type=Path, default=RICEROCKS_PATH, help="game script to run")
+    parser.add_argument("--ticks", type=int, default=100000, help="number of frames to simulate")
+    parser.add_argument("--no-start", action="store_true", help="stay on the splash screen")
+    parser.add_argument("--profile", action="store_true", help="time the draw loop's phases (if the game has a profiler)")
+    args = parser.parse_args(argv)
+
+    runner = TickRunner(load_game(args.game))
+    profiler = getattr(runner.game, "profiler", None)
+    if args.profile and profiler is not None:
+        profiler.enable()
+    if not args.no_start:
+        runner.press_start()
+
+    start = time.perf_counter()
+    runner.run(args.ticks)
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.ticks} ticks in {elapsed:.2f}s ({args.ticks / elapsed:,.0f} ticks/s)")
+    for name in ("score", "lives"):
+        if hasattr(runner.game, name):
+            print(f"{name}: {getattr(runner.game, name)}")
+    for name, value in sorted(vars(runner.game).items()):
+        if hasattr(value, "high_water") or hasattr(value, "saved") or hasattr(value, "level"):
+            print(f"{name}: {value.stats()}")
+    if args.profile and profiler is not None:
+        print("phase        p50    p95    p99 (ms)")
+        for phase in profiler.phases:
+            p50, p95, p99 = profiler.percentiles(phase)
+            print(f"{phase:<10} {p50:6.3f} {p95:6.3f} {p99:6.3f}")
+
+
+if __name__ == "__main__":
+    main()
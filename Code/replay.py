@@ -0,0 +1,190 @@
+"""
+Deterministic input recording and accelerated replay for RiceRocks.
+A journal holds the RNG seed, every keydown / keyup / click / rock spawn
+stamped with its tick, and the final score and lives. Replaying feeds the
+same events back on the same ticks through the headless backend, much
+faster than real time, and checks the session ends the same way.
+
+    python replay.py record session.json --ticks 20000
+    python replay.py play session.json
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Optional, Sequence
+
+from headless_runner import RICEROCKS_PATH, TickRunner, load_game
+
+# ------------------------------------------------------------------
+# Journal
+# ------------------------------------------------------------------
+
+JOURNAL_VERSION: int = 1
+
+
+class ReplayMismatch(AssertionError):
+    """Raised when a replayed session does not end the way it was recorded."""
+
+
+class InputJournal:
+    """Seed, tick-stamped input events and the outcome of one session."""
+
+    def __init__(self, seed: int) -> None:
+        self.seed = seed
+        self.events: list[tuple[int, str, Any]] = []
+        self.final: Optional[dict[str, int]] = None
+
+    def record(self, tick: int, kind: str, arg: Any = None) -> None:
+        self.events.append((tick, kind, arg))
+
+    def finish(self, game: ModuleType) -> None:
+        self.final = {"ticks": game.time, "score": game.score, "lives": game.lives}
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"version": JOURNAL_VERSION, "seed": self.seed,
+                "events": [list(event) for event in self.events], "final": self.final}
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "InputJournal":
+        if data.get("version") != JOURNAL_VERSION:
+            raise ValueError(f"Unsupported journal version: {data.get('version')!r}")
+        journal = cls(data["seed"])
+        journal.events = [(tick, kind, arg) for tick, kind, arg in data["events"]]
+        journal.final = data["final"]
+        return journal
+
+    def save(self, path: Path) -> None:
+        Path(path).write_text(json.dumps(self.to_dict(), separators=(",", ":")))
+
+    @classmethod
+    def load(cls, path: Path) -> "InputJournal":
+        return cls.from_dict(json.loads(Path(path).read_text()))
+
+# ------------------------------------------------------------------
+# Recording
+# ------------------------------------------------------------------
+
+def start_recording(game: ModuleType, seed: Optional[int] = None) -> InputJournal:
+    """Seed the game's RNG and start journaling its input events."""
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    random.seed(seed)
+    journal = InputJournal(seed)
+    game.journal = journal
+    return journal
+
+
+def stop_recording(game: ModuleType) -> InputJournal:
+    """Stop journaling and store the session's final score and lives."""
+    journal = game.journal
+    game.journal = None
+    journal.finish(game)
+    return journal
+
+# ------------------------------------------------------------------
+# Replay
+# ------------------------------------------------------------------
+
+def dispatch(game: ModuleType, kind: str, arg: Any) -> None:
+    if kind == "keydown":
+        game.keydown(arg)
+    elif kind == "keyup":
+        game.keyup(arg)
+    elif kind == "click":
+        game.click(arg)
+    elif kind == "spawn":
+        game.rock_spawner()
+    else:
+        raise ValueError(f"Unknown event kind: {kind!r}")
+
+
+def replay(journal: InputJournal, path: Path = RICEROCKS_PATH) -> ModuleType:
+    """
+    Re-run a recorded session on a fresh headless game and return it.
+    Raises ReplayMismatch if the final score or lives differ.
+    """
+    game = load_game(path)
+    random.seed(journal.seed)
+    canvas = TickRunner(game).canvas
+    draw = game.draw
+
+    final_tick = journal.final["ticks"]
+    events = journal.events
+    i = 0
+    while True:
+        # events recorded between draw number `time` and the next one
+        while i < len(events) and events[i][0] == game.time:
+            dispatch(game, events[i][1], events[i][2])
+            i += 1
+        if game.time >= final_tick:
+            break
+        draw(canvas)
+
+    expected = (journal.final["score"], journal.final["lives"])
+    actual = (game.score, game.lives)
+    if actual != expected:
+        raise ReplayMismatch(f"Replay ended with score/lives {actual}, recorded {expected}")
+    return game
+
+# ------------------------------------------------------------------
+# CLI
+# ------------------------------------------------------------------
+
+def record_bot_session(ticks: int, seed: int, path: Path = RICEROCKS_PATH) -> InputJournal:
+    """Record a headless session played by a random bot."""
+    game = load_game(path)
+    runner = TickRunner(game)
+    journal = start_recording(game, seed)
+    bot = random.Random(seed ^ 0x5EED)
+    keys = [game.simplegui.KEY_MAP[name] for name in ("left", "right", "up", "space")]
+
+    runner.press_start()
+    held: set[int] = set()
+    for _ in range(ticks):
+        if bot.random() < 0.05:
+            key = bot.choice(keys)
+            if key in held:
+                runner.keyup(key)
+                held.discard(key)
+            else:
+                runner.keydown(key)
+                held.add(key)
+        if not game.started and bot.random() < 0.01:
+            runner.press_start()
+        runner.step()
+    return stop_recording(game)
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Record or replay RiceRocks input journals.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rec = sub.add_parser("record", help="record a headless session played by a random bot")
+    rec.add_argument("journal", type=Path)
+    rec.add_argument("--ticks", type=int, default=20000)
+    rec.add_argument("--seed", type=int, default=0)
+    play = sub.add_parser("play", help="replay a journal and check its final score and lives")
+    play.add_argument("journal", type=Path)
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        journal = record_bot_session(args.ticks, args.seed)
+        journal.save(args.journal)
+        print(f"recorded {len(journal.events)} events over {journal.final['ticks']} ticks "
+              f"(score {journal.final['score']}, lives {journal.final['lives']})")
+    else:
+        journal = InputJournal.load(args.journal)
+        start = time.perf_counter()
+        replay(journal)
+        elapsed = time.perf_counter() - start
+        ticks = journal.final["ticks"]
+        print(f"replayed {ticks} ticks in {elapsed:.2f}s "
+              f"({ticks / 60.0 / elapsed:.0f}x real time) - score and lives match")
+
+
+if __name__ == "__main__":
+    main()
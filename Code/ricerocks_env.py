@@ -0,0 +1,242 @@
+"""
+Reset/step environment around the RiceRocks rules, plus a vector wrapper
+that runs many independent episodes across worker processes.
+Everything runs on the headless simplegui backend: no display, no browser.
+
+    python ricerocks_env.py --envs 8 --steps 5000
+"""
+
+from __future__ import annotations
+import argparse
+import multiprocessing as mp
+import os
+import random
+import time
+from typing import Any, Optional, Sequence
+
+import numpy as np
+
+from headless_runner import TickRunner, load_game
+
+# ------------------------------------------------------------------
+# Actions and observations
+# ------------------------------------------------------------------
+
+# an action is a (turn, thrust, fire) combination: turn is 0 = none,
+# 1 = left, 2 = right; thrust and fire are 0 / 1
+ACTIONS: tuple[tuple[int, int, int], ...] = tuple(
+    (turn, thrust, fire) for turn in range(3) for thrust in range(2) for fire in range(2))
+N_ACTIONS: int = len(ACTIONS)
+
+# the observation holds the ship, then the nearest rocks (zero padded)
+N_ROCKS: int = 12
+SHIP_FEATURES: int = 6      # x, y, vx, vy, cos(angle), sin(angle)
+ROCK_FEATURES: int = 5      # present, dx, dy, vx, vy relative to the ship
+OBS_SIZE: int = SHIP_FEATURES + N_ROCKS * ROCK_FEATURES
+
+# reward per rock destroyed and per life lost
+ROCK_REWARD: float = 1.0
+LIFE_PENALTY: float = -5.0
+
+# ------------------------------------------------------------------
+# Single environment
+# ------------------------------------------------------------------
+
+class RiceRocksEnv:
+    """
+    One RiceRocks episode behind a gymnasium-style API:
+    reset() -> (obs, info) and step(action) -> (obs, reward, terminated, truncated, info).
+    Each env keeps its own RNG state, so several envs can share a process
+    and still replay identically from their seeds.
+    """
+
+    def __init__(self, frame_skip: int = 4, max_ticks: int = 60 * 60 * 5) -> None:
+        self.frame_skip = frame_skip
+        self.max_ticks = max_ticks
+        self.game: Any = None
+        self.runner: Optional[TickRunner] = None
+        self.rng_state: Any = None
+        self.keys: tuple[int, ...] = ()
+        self.held = (0, 0)
+
+    def reset(self, seed: Optional[int] = None) -> tuple[np.ndarray, dict]:
+        self.game = load_game()
+        self.runner = TickRunner(self.game)
+        keys = self.game.simplegui.KEY_MAP
+        self.keys = (keys["left"], keys["right"], keys["up"], keys["space"])
+        self.held = (0, 0)
+
+        rng = random.Random(seed)
+        self.rng_state = rng.getstate()
+        self.runner.press_start()
+        return self.observe(), {"score": 0, "lives": self.game.lives}
+
+    def _set_held(self, turn: int, thrust: int) -> None:
+        # the game reacts to key edges, so only send what changed
+        runner = self.runner
+        left, right, up, _ = self.keys
+        old_turn, old_thrust = self.held
+        if turn != old_turn:
+            if old_turn:
+                runner.keyup(left if old_turn == 1 else right)
+            if turn:
+                runner.keydown(left if turn == 1 else right)
+        if thrust != old_thrust:
+            if thrust:
+                runner.keydown(up)
+            else:
+                runner.keyup(up)
+        self.held = (turn, thrust)
+
+    def step(self, action: int) -> tuple[np.ndarray, float, bool, bool, dict]:
+        game = self.game
+        turn, thrust, fire = ACTIONS[action]
+        score, lives = game.score, game.lives
+
+        saved = random.getstate()
+        random.setstate(self.rng_state)
+        try:
+            self._set_held(turn, thrust)
+            if fire:
+                self.runner.keydown(self.keys[3])
+                self.runner.keyup(self.keys[3])
+            for _ in range(self.frame_skip):
+                self.runner.step()
+                if not game.started:
+                    break
+        finally:
+            self.rng_state = random.getstate()
+            random.setstate(saved)
+
+        reward = ROCK_REWARD * (game.score - score) + LIFE_PENALTY * (lives - game.lives)
+        terminated = not game.started
+        truncated = game.time >= self.max_ticks
+        return self.observe(), reward, terminated, truncated, {"score": game.score, "lives": game.lives}
+
+    def observe(self) -> np.ndarray:
+        game = self.game
+        width, height = game.WIDTH, game.HEIGHT
+        ship = game.my_ship
+        sx, sy = ship.get_position()
+        obs = np.zeros(OBS_SIZE, dtype=np.float32)
+        obs[:SHIP_FEATURES] = (sx / width, sy / height, ship.vel[0], ship.vel[1],
+                               np.cos(ship.angle), np.sin(ship.angle))
+
+        # rocks as wrapped offsets from the ship, nearest first
+        for i, rock in enumerate(game.nearest_rocks([sx, sy], N_ROCKS)):
+            dx, dy = game.wrapped_delta(rock.get_position(), [sx, sy])
+            vx, vy = rock.get_velocity()
+            start = SHIP_FEATURES + i * ROCK_FEATURES
+            obs[start:start + ROCK_FEATURES] = (1.0, dx / width, dy / height, vx, vy)
+        return obs
+
+# ------------------------------------------------------------------
+# Vector environment
+# ------------------------------------------------------------------
+
+def _worker(conn: Any, n_envs: int, env_kwargs: dict) -> None:
+    envs = [RiceRocksEnv(**env_kwargs) for _ in range(n_envs)]
+    while True:
+        command, data = conn.recv()
+        if command == "reset":
+            conn.send(np.stack([env.reset(seed)[0] for env, seed in zip(envs, data)]))
+        elif command == "step":
+            obs, rewards, terminated, truncated = [], [], [], []
+            for env, action in zip(envs, data):
+                o, r, term, trunc, _ = env.step(action)
+                if term or trunc:
+                    o, _ = env.reset()
+                obs.append(o)
+                rewards.append(r)
+                terminated.append(term)
+                truncated.append(trunc)
+            conn.send((np.stack(obs), np.array(rewards, dtype=np.float32),
+                       np.array(terminated), np.array(truncated)))
+        elif command == "close":
+            conn.close()
+            return
+
+
+class VectorRiceRocksEnv:
+    """
+    N independent RiceRocks episodes spread over worker processes.
+    reset() and step() take and return batched arrays with one row per
+    env; finished episodes are reset automatically.
+    """
+
+    def __init__(self, n_envs: int, n_workers: Optional[int] = None,
+                 context: Optional[str] = None, **env_kwargs: Any) -> None:
+        n_workers = min(n_envs, n_workers or os.cpu_count() or 1)
+        ctx = mp.get_context(context)
+        self.n_envs = n_envs
+        self.splits = [len(part) for part in np.array_split(np.arange(n_envs), n_workers)]
+        self.conns = []
+        self.procs = []
+        for size in self.splits:
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(target=_worker, args=(child, size, env_kwargs), daemon=True)
+            proc.start()
+            child.close()
+            self.conns.append(parent)
+            self.procs.append(proc)
+
+    def _scatter(self, items: Sequence[Any]) -> list[Sequence[Any]]:
+        parts, start = [], 0
+        for size in self.splits:
+            parts.append(items[start:start + size])
+            start += size
+        return parts
+
+    def reset(self, seed: Optional[int] = None) -> np.ndarray:
+        seeds = [None if seed is None else seed + i for i in range(self.n_envs)]
+        for conn, part in zip(self.conns, self._scatter(seeds)):
+            conn.send(("reset", part))
+        return np.concatenate([conn.recv() for conn in self.conns])
+
+    def step(self, actions: Sequence[int]) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        for conn, part in zip(self.conns, self._scatter(list(actions))):
+            conn.send(("step", part))
+        results = [conn.recv() for conn in self.conns]
+        return tuple(np.concatenate(column) for column in zip(*results))
+
+    def close(self) -> None:
+        for conn in self.conns:
+            conn.send(("close", None))
+        for proc in self.procs:
+            proc.join()
+
+    def __enter__(self) -> "VectorRiceRocksEnv":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+# ------------------------------------------------------------------
+# CLI
+# ------------------------------------------------------------------
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Measure vector-env throughput with random actions.")
+    parser.add_argument("--envs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    with VectorRiceRocksEnv(args.envs, args.workers) as env:
+        env.reset(args.seed)
+        start = time.perf_counter()
+        total_reward = 0.0
+        for _ in range(args.steps):
+            _, rewards, _, _ = env.step(rng.integers(N_ACTIONS, size=args.envs))
+            total_reward += float(rewards.sum())
+        elapsed = time.perf_counter() - start
+
+    steps = args.steps * args.envs
+    print(f"{steps} env steps in {elapsed:.2f}s ({steps / elapsed:,.0f} steps/s), "
+          f"mean reward per step {total_reward / steps:+.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,519 @@
+"""
+Local-server multiplayer for RiceRocks.
+An asyncio server runs one authoritative field of rocks, missiles and
+explosions from the game module and gives every connected client its own
+Ship. Each tick a client is sent only its area of interest - the nearest
+entities around its ship, capped in number - delta-compressed against
+what it was sent on the previous tick, so bandwidth and per-client server
+work stay flat however many rocks are on the field.
+
+    python ricerocks_server.py serve --port 8765
+    python ricerocks_server.py bots --clients 4 --rocks 12 200 2000
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import math
+import random
+import struct
+import time
+from types import ModuleType
+from typing import Optional, Sequence
+
+from engine import grid_nearest, grid_shape
+from headless_runner import FRAME_RATE, load_game
+
+# ------------------------------------------------------------------
+# Protocol
+# ------------------------------------------------------------------
+
+# every message is a little-endian length prefix followed by its body
+FRAME = struct.Struct("<I")
+
+# server -> client, once: magic, the client's own entity id, world size
+WELCOME = struct.Struct("<4sIHH")
+MAGIC: bytes = b"RRMP"
+
+# server -> client, every tick: tick, team score, own lives, removed and
+# changed entity counts; then the removed ids, then the changed records
+TICK = struct.Struct("<IIBHH")
+ENTITY_ID = struct.Struct("<I")
+
+# a changed record is its id, a field mask, then the fields named by the mask
+MASK = struct.Struct("<IB")
+NEW = 1             # kind, full position, angle and frame follow
+POS_FULL = 2        # x, y as quantized unsigned shorts
+POS_DELTA = 4       # dx, dy as signed bytes
+ANGLE = 8           # angle in 256ths of a turn
+FRAME_NO = 16       # animation frame (explosions) or thrust (ships)
+KIND = struct.Struct("<B")
+POS = struct.Struct("<HH")
+DELTA = struct.Struct("<bb")
+BYTE = struct.Struct("<B")
+
+# client -> server: held controls as bit flags; fire shoots on its rising edge
+INPUT = struct.Struct("<B")
+LEFT, RIGHT, THRUST, FIRE = 1, 2, 4, 8
+
+SHIP, ROCK, MISSILE, EXPLOSION = range(4)
+
+# positions are sent in 1/POS_SCALE pixels
+POS_SCALE: int = 16
+
+# area of interest: radius around a ship, and most entities sent per tick
+AOI_RADIUS: float = 400.0
+AOI_LIMIT: int = 48
+
+# entities per interest grid cell the grid is sized for
+CELL_FILL: float = 4.0
+
+# lives per ship before it is put back in the middle with a fresh set
+PLAYER_LIVES: int = 3
+
+# ------------------------------------------------------------------
+# Area of interest
+# ------------------------------------------------------------------
+
+class InterestGrid:
+    """
+    Every entity on the field bucketed into a wrapped grid whose cells are
+    resized on each rebuild to hold about CELL_FILL entities. A nearest-k
+    search walks rings of cells outwards from the query point and stops as
+    soon as no unvisited cell can hold anything closer, so it visits about
+    k / CELL_FILL cells however dense the field gets. The grid sizing and
+    ring search are engine.py's, shared with the game's SpatialHash.
+    """
+
+    def __init__(self, width: float, height: float) -> None:
+        self.width = width
+        self.height = height
+        self.cols = self.rows = 1
+        self.cell_width, self.cell_height = width, height
+        self.cells: dict[tuple[int, int], list[tuple[float, float, int, object]]] = {}
+
+    def rebuild(self, entries: list[tuple[float, float, int, object]]) -> None:
+        """Re-bucket (x, y, kind, entity) entries; the work is shared by every query."""
+        self.cols, self.rows = grid_shape(self.width, self.height, len(entries), CELL_FILL)
+        self.cell_width = self.width / self.cols
+        self.cell_height = self.height / self.rows
+        cells: dict[tuple[int, int], list[tuple[float, float, int, object]]] = {}
+        for entry in entries:
+            key = (int(entry[0] // self.cell_width) % self.cols, int(entry[1] // self.cell_height) % self.rows)
+            bucket = cells.get(key)
+            if bucket is None:
+                cells[key] = [entry]
+            else:
+                bucket.append(entry)
+        self.cells = cells
+
+    def nearest(self, center: Sequence[float], radius: float, k: int) -> list[tuple[float, int, object]]:
+        """Up to k (squared distance, kind, entity) within radius of center, nearest first."""
+        width, height = self.width, self.height
+        cx, cy = center[0], center[1]
+
+        def distance(entry: tuple[float, float, int, object]) -> float:
+            dx = (entry[0] - cx + width / 2) % width - width / 2
+            dy = (entry[1] - cy + height / 2) % height - height / 2
+            return dx * dx + dy * dy
+
+        col = int(cx // self.cell_width) % self.cols
+        row = int(cy // self.cell_height) % self.rows
+        found = grid_nearest(self.cells, col, row, self.cols, self.rows,
+                             min(self.cell_width, self.cell_height), k, distance, radius * radius)
+        return [(d, entry[2], entry[3]) for d, entry in found]
+
+# ------------------------------------------------------------------
+# Server
+# ------------------------------------------------------------------
+
+class Player:
+    """One connected client: its ship, held controls and delta baseline."""
+
+    def __init__(self, net_id: int, ship: object, writer: asyncio.StreamWriter) -> None:
+        self.net_id = net_id
+        self.ship = ship
+        self.writer = writer
+        self.controls = 0
+        self.fired = False
+        self.lives = PLAYER_LIVES
+        self.baseline: dict[int, tuple[int, int, int, int, int]] = {}
+        self.bytes_sent = 0
+        self.encode_time = 0.0
+
+
+class GameServer:
+    """Authoritative RiceRocks simulation shared by every connected client."""
+
+    def __init__(self, game: Optional[ModuleType] = None) -> None:
+        self.game = game or load_game()
+        self.game.started = True
+        self.tick = 0
+        self.players: dict[int, Player] = {}
+        self.net_ids: dict[tuple[object, int], int] = {}
+        self.next_id = 1
+        self.grid = InterestGrid(self.game.WIDTH, self.game.HEIGHT)
+        self.sim_time = 0.0
+
+    @staticmethod
+    def _key(thing: object) -> tuple[object, int]:
+        """
+        Identity of a ship or sprite for net ids. Pooled sprites are reused,
+        so their generation is part of it and a new shot never inherits the
+        id of the one whose slot it took.
+        """
+        return thing, getattr(thing, "generation", 0)
+
+    def _net_id(self, thing: object) -> int:
+        key = self._key(thing)
+        net_id = self.net_ids.get(key)
+        if net_id is None:
+            net_id = self.net_ids[key] = self.next_id
+            self.next_id += 1
+        return net_id
+
+    # --- players ---
+
+    def join(self, writer: asyncio.StreamWriter) -> Player:
+        game = self.game
+        ship = game.Ship([game.WIDTH / 2, game.HEIGHT / 2], [0, 0], 0, game.ship_image, game.ship_info)
+        player = Player(self._net_id(ship), ship, writer)
+        self.players[player.net_id] = player
+        writer.write(FRAME.pack(WELCOME.size) + WELCOME.pack(MAGIC, player.net_id, game.WIDTH, game.HEIGHT))
+        return player
+
+    def leave(self, player: Player) -> None:
+        self.players.pop(player.net_id, None)
+        self.net_ids.pop(self._key(player.ship), None)
+
+    # --- simulation ---
+
+    def _advance(self, group: object) -> None:
+        game = self.game
+        if isinstance(group, game.SpriteStore):
+            group.update()
+            return
+        for x in list(group):
+            if x.update():
+                group.remove(x)
+                game.release_sprite(x)
+
+    def step(self) -> None:
+        """Advance the shared field by one tick."""
+        game = self.game
+        start = time.perf_counter()
+        self.tick += 1
+        game.time += 1
+
+        for player in self.players.values():
+            ship, controls = player.ship, player.controls
+            ship.angle_vel = .05 * (bool(controls & RIGHT) - bool(controls & LEFT))
+            ship.thrust = bool(controls & THRUST)
+            if controls & FIRE and not player.fired:
+                ship.shoot()
+            player.fired = bool(controls & FIRE)
+            ship.update()
+
+        for group in (game.rock_group, game.missile_group, game.explosion_group):
+            self._advance(group)
+        game.rock_hash.rebuild(game.rock_group)
+        game.missile_hash.rebuild(game.missile_group)
+
+        for player in self.players.values():
+            if game.group_collide(game.rock_group, player.ship, game.rock_hash):
+                player.lives -= 1
+                if player.lives == 0:
+                    player.lives = PLAYER_LIVES
+                    player.ship.pos[:] = [game.WIDTH / 2, game.HEIGHT / 2]
+                    player.ship.vel[:] = [0, 0]
+        game.score += game.group_group_collide(game.rock_group, game.missile_group,
+                                               game.missile_hash, game.rock_hash)
+
+        if self.tick % FRAME_RATE == 0:
+            game.rock_spawner([player.ship for player in self.players.values()])
+        self.sim_time += time.perf_counter() - start
+
+    # --- area of interest ---
+
+    def _state(self, kind: int, x: object) -> tuple[int, int, int, int, int]:
+        """Quantized (kind, x, y, angle, frame) of a ship or sprite."""
+        store = getattr(x, "store", None)
+        if store is not None:
+            px, py = store.pos[x.slot].tolist()
+            angle = float(store.angle[x.slot])
+            age = int(store.age[x.slot])
+        else:
+            px, py = x.pos
+            angle = x.angle
+            age = int(x.thrust) if kind == SHIP else x.age
+        # only explosions animate and only ships show thrust
+        frame = min(age, 255) if kind in (SHIP, EXPLOSION) else 0
+        return (kind, int(px * POS_SCALE), int(py * POS_SCALE),
+                int(angle / (2 * math.pi) * 256) & 255, frame)
+
+    def index(self) -> None:
+        """Bucket every ship and sprite into the interest grid for this tick's updates."""
+        game = self.game
+        start = time.perf_counter()
+        entries = [(p.ship.pos[0], p.ship.pos[1], SHIP, p.ship) for p in self.players.values()]
+        for kind, group in ((ROCK, game.rock_group), (MISSILE, game.missile_group),
+                            (EXPLOSION, game.explosion_group)):
+            if isinstance(group, game.SpriteStore):
+                positions = zip(group.pos[:group.count].tolist(), group.sprites)
+            else:
+                positions = ((x.get_position(), x) for x in group)
+            entries += [(pos[0], pos[1], kind, x) for pos, x in positions]
+        self.grid.rebuild(entries)
+        self.sim_time += time.perf_counter() - start
+
+    def visible(self, player: Player) -> dict[int, tuple[int, int, int, int, int]]:
+        """The nearest entities around a player's ship, at most AOI_LIMIT of them."""
+        view = {}
+        for _, kind, x in self.grid.nearest(player.ship.pos, AOI_RADIUS, AOI_LIMIT):
+            view[self._net_id(x)] = self._state(kind, x)
+        return view
+
+    # --- delta encoding ---
+
+    def encode(self, player: Player) -> bytes:
+        """This tick's update for a player, relative to the last one it was sent."""
+        start = time.perf_counter()
+        view = self.visible(player)
+        baseline = player.baseline
+        span_x = self.game.WIDTH * POS_SCALE
+        span_y = self.game.HEIGHT * POS_SCALE
+
+        removed = [net_id for net_id in baseline if net_id not in view]
+        records = []
+        for net_id, state in view.items():
+            old = baseline.get(net_id)
+            kind, x, y, angle, frame = state
+            if old is None or old[0] != kind:
+                records.append(MASK.pack(net_id, NEW | POS_FULL | ANGLE | FRAME_NO) + KIND.pack(kind)
+                               + POS.pack(x, y) + BYTE.pack(angle) + BYTE.pack(frame))
+                continue
+
+            mask, fields = 0, b""
+            dx = (x - old[1] + span_x // 2) % span_x - span_x // 2
+            dy = (y - old[2] + span_y // 2) % span_y - span_y // 2
+            if dx or dy:
+                if -128 <= dx < 128 and -128 <= dy < 128:
+                    mask |= POS_DELTA
+                    fields += DELTA.pack(dx, dy)
+                else:
+                    mask |= POS_FULL
+                    fields += POS.pack(x, y)
+            if angle != old[3]:
+                mask |= ANGLE
+                fields += BYTE.pack(angle)
+            if frame != old[4]:
+                mask |= FRAME_NO
+                fields += BYTE.pack(frame)
+            if mask:
+                records.append(MASK.pack(net_id, mask) + fields)
+
+        body = b"".join([TICK.pack(self.tick, self.game.score, player.lives, len(removed), len(records))]
+                        + [ENTITY_ID.pack(net_id) for net_id in removed] + records)
+        player.baseline = view
+        player.encode_time += time.perf_counter() - start
+        player.bytes_sent += FRAME.size + len(body)
+        return FRAME.pack(len(body)) + body
+
+    def forget_gone(self) -> None:
+        """Drop net ids of sprites that left the field."""
+        game = self.game
+        live = {self._key(p.ship) for p in self.players.values()}
+        for group in (game.rock_group, game.missile_group, game.explosion_group):
+            live.update(self._key(x) for x in group)
+        for key in [key for key in self.net_ids if key not in live]:
+            del self.net_ids[key]
+
+    # --- networking ---
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        player = self.join(writer)
+        try:
+            while True:
+                player.controls = INPUT.unpack(await reader.readexactly(INPUT.size))[0]
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.leave(player)
+            writer.close()
+
+    async def broadcast(self) -> None:
+        self.index()
+        for player in list(self.players.values()):
+            try:
+                player.writer.write(self.encode(player))
+                await player.writer.drain()
+            except ConnectionError:
+                self.leave(player)
+
+    async def run(self, ticks: Optional[int] = None) -> None:
+        """Tick at the frame rate, sending every player its update each tick."""
+        period = 1.0 / FRAME_RATE
+        deadline = time.perf_counter()
+        while ticks is None or self.tick < ticks:
+            self.step()
+            await self.broadcast()
+            if self.tick % FRAME_RATE == 0:
+                self.forget_gone()
+            deadline += period
+            await asyncio.sleep(max(0.0, deadline - time.perf_counter()))
+
+# ------------------------------------------------------------------
+# Client
+# ------------------------------------------------------------------
+
+class Client:
+    """Headless client that mirrors its area of interest from the server."""
+
+    def __init__(self) -> None:
+        self.net_id = 0
+        self.world = (0, 0)
+        self.tick = 0
+        self.score = 0
+        self.lives = 0
+        self.entities: dict[int, tuple[int, int, int, int, int]] = {}
+        self.bytes_received = 0
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def connect(self, host: str, port: int) -> None:
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        magic, self.net_id, width, height = WELCOME.unpack(await self._message())
+        if magic != MAGIC:
+            raise ValueError("Not a RiceRocks server")
+        self.world = (width * POS_SCALE, height * POS_SCALE)
+
+    async def _message(self) -> bytes:
+        size = FRAME.unpack(await self.reader.readexactly(FRAME.size))[0]
+        self.bytes_received += FRAME.size + size
+        return await self.reader.readexactly(size)
+
+    def send(self, controls: int) -> None:
+        self.writer.write(INPUT.pack(controls))
+
+    def apply(self, body: bytes) -> None:
+        """Apply one tick update to the mirrored entities."""
+        self.tick, self.score, self.lives, n_removed, n_changed = TICK.unpack_from(body, 0)
+        offset = TICK.size
+        entities = self.entities
+        for _ in range(n_removed):
+            del entities[ENTITY_ID.unpack_from(body, offset)[0]]
+            offset += ENTITY_ID.size
+
+        span_x, span_y = self.world
+        for _ in range(n_changed):
+            net_id, mask = MASK.unpack_from(body, offset)
+            offset += MASK.size
+            kind, x, y, angle, frame = entities.get(net_id, (0, 0, 0, 0, 0))
+            if mask & NEW:
+                kind = KIND.unpack_from(body, offset)[0]
+                offset += KIND.size
+            if mask & POS_FULL:
+                x, y = POS.unpack_from(body, offset)
+                offset += POS.size
+            if mask & POS_DELTA:
+                dx, dy = DELTA.unpack_from(body, offset)
+                offset += DELTA.size
+                x, y = (x + dx) % span_x, (y + dy) % span_y
+            if mask & ANGLE:
+                angle = BYTE.unpack_from(body, offset)[0]
+                offset += BYTE.size
+            if mask & FRAME_NO:
+                frame = BYTE.unpack_from(body, offset)[0]
+                offset += BYTE.size
+            entities[net_id] = (kind, x, y, angle, frame)
+
+    async def receive(self) -> None:
+        self.apply(await self._message())
+
+    def close(self) -> None:
+        self.writer.close()
+
+# ------------------------------------------------------------------
+# CLI
+# ------------------------------------------------------------------
+
+async def _bot(client: Client, ticks: int, seed: int) -> None:
+    """Receive updates and hold random controls, changing them now and then."""
+    rng = random.Random(seed)
+    controls = 0
+    while client.tick < ticks:
+        await client.receive()
+        if rng.random() < .05:
+            controls = rng.randrange(16)
+            client.send(controls)
+
+
+async def bot_session(clients: int, rocks: int, ticks: int, port: int) -> dict[str, float]:
+    """Run a server and headless bot clients over loopback, and measure per-client costs."""
+    server = GameServer()
+    server.game.set_stress_mode(rocks, rocks)
+    server.game.rock_spawner()
+    listener = await asyncio.start_server(server.handle, "127.0.0.1", port)
+
+    bots = [Client() for _ in range(clients)]
+    for client in bots:
+        await client.connect("127.0.0.1", port)
+    while len(server.players) < clients:
+        await asyncio.sleep(0)
+
+    runner = asyncio.create_task(server.run(ticks))
+    await asyncio.gather(*(_bot(client, ticks, seed) for seed, client in enumerate(bots)))
+    await runner
+
+    # every client should hold exactly what the server last sent it
+    in_sync = all(client.entities == server.players[client.net_id].baseline for client in bots)
+    players = list(server.players.values())
+    for client in bots:
+        client.close()
+    while server.players:
+        await asyncio.sleep(.01)
+    listener.close()
+    await listener.wait_closed()
+    return {
+        "rocks": len(server.game.rock_group),
+        "bytes_per_tick": sum(p.bytes_sent for p in players) / len(players) / ticks,
+        "encode_us": sum(p.encode_time for p in players) / len(players) / ticks * 1e6,
+        "sim_us": server.sim_time / ticks * 1e6,
+        "in_sync": in_sync,
+    }
+
+
+async def serve(host: str, port: int) -> None:
+    server = GameServer()
+    listener = await asyncio.start_server(server.handle, host, port)
+    print(f"serving RiceRocks on {host}:{port}")
+    async with listener:
+        await server.run()
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Multiplayer RiceRocks server and bot clients.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_cmd = commands.add_parser("serve", help="run a server until interrupted")
+    serve_cmd.add_argument("--host", default="127.0.0.1")
+    serve_cmd.add_argument("--port", type=int, default=8765)
+    bots_cmd = commands.add_parser("bots", help="run a server with headless bot clients on loopback")
+    bots_cmd.add_argument("--clients", type=int, default=4)
+    bots_cmd.add_argument("--rocks", type=int, nargs="+", default=[12, 200, 2000])
+    bots_cmd.add_argument("--ticks", type=int, default=300)
+    bots_cmd.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        asyncio.run(serve(args.host, args.port))
+        return
+
+    print(f"{'rocks':>6} {'bytes/tick/client':>18} {'encode us/client':>17} {'sim us':>8}  in sync")
+    for rocks in args.rocks:
+        result = asyncio.run(bot_session(args.clients, rocks, args.ticks, args.port))
+        print(f"{result['rocks']:>6} {result['bytes_per_tick']:>18,.0f} {result['encode_us']:>17,.0f} "
+              f"{result['sim_us']:>8,.0f}  {result['in_sync']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Compact binary snapshots of a running RiceRocks game.
+The ship, the three sprite groups, score, lives, time, started and the
+RNG state are packed into one fixed-layout little-endian blob with
+struct, so a state can be taken and restored every frame (rollback,
+crash recovery, test fixtures) far faster than pickling the objects.
+
+Layout:
+    header  magic, score, lives, time, started, rock/missile/explosion counts
+    ship    x, y, vx, vy, angle, angle_vel, thrust
+    rng     version, 625 Mersenne Twister words, has_gauss, gauss_next
+    sprites x, y, vx, vy, angle, angle_vel, age - rocks, missiles, explosions
+"""
+
+from __future__ import annotations
+import random
+import struct
+import time
+from pathlib import Path
+from types import ModuleType
+from typing import Sequence
+
+MAGIC: bytes = b"RRS1"
+HEADER = struct.Struct("<4sqqq?III")
+SHIP = struct.Struct("<6d?")
+RNG = struct.Struct("<I625I?d")
+SPRITE_FIELDS: int = 7
+
+_sprite_formats: dict[int, struct.Struct] = {}
+
+
+def _sprites_struct(count: int) -> struct.Struct:
+    layout = _sprite_formats.get(count)
+    if layout is None:
+        layout = _sprite_formats[count] = struct.Struct(f"<{count * SPRITE_FIELDS}d")
+    return layout
+
+# ------------------------------------------------------------------
+# Snapshot
+# ------------------------------------------------------------------
+
+def _group_values(game: ModuleType, group) -> list[float]:
+    """Flattened per-sprite fields of a group, in iteration order."""
+    if isinstance(group, game.SpriteStore):
+        import numpy
+        n = group.count
+        return numpy.column_stack((group.pos[:n], group.vel[:n], group.angle[:n],
+                                   group.angle_vel[:n], group.age[:n])).ravel().tolist()
+    values: list[float] = []
+    for x in group:
+        values += (x.pos[0], x.pos[1], x.vel[0], x.vel[1], x.angle, x.angle_vel, x.age)
+    return values
+
+
+def snapshot(game: ModuleType) -> bytes:
+    """Pack the full game state into bytes."""
+    groups = (game.rock_group, game.missile_group, game.explosion_group)
+    ship = game.my_ship
+    version, words, gauss = random.getstate()
+
+    sprites: list[float] = []
+    for group in groups:
+        sprites += _group_values(game, group)
+
+    return b"".join((
+        HEADER.pack(MAGIC, game.score, game.lives, game.time, game.started,
+                    len(groups[0]), len(groups[1]), len(groups[2])),
+        SHIP.pack(ship.pos[0], ship.pos[1], ship.vel[0], ship.vel[1],
+                  ship.angle, ship.angle_vel, ship.thrust),
+        RNG.pack(version, *words, gauss is not None, gauss or 0.0),
+        _sprites_struct(len(sprites) // SPRITE_FIELDS).pack(*sprites),
+    ))
+
+# ------------------------------------------------------------------
+# Restore
+# ------------------------------------------------------------------
+
+def _clear(game: ModuleType, group) -> None:
+    for x in list(group):
+        group.discard(x)
+        game.release_sprite(x)
+
+
+def restore(game: ModuleType, blob: bytes) -> None:
+    """Put the game back into the state packed by snapshot()."""
+    magic, score, lives, tick, started, n_rocks, n_missiles, n_explosions = HEADER.unpack_from(blob, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a RiceRocks snapshot")
+    offset = HEADER.size
+
+    x, y, vx, vy, angle, angle_vel, thrust = SHIP.unpack_from(blob, offset)
+    offset += SHIP.size
+    rng = RNG.unpack_from(blob, offset)
+    offset += RNG.size
+    counts = (n_rocks, n_missiles, n_explosions)
+    values = _sprites_struct(sum(counts)).unpack_from(blob, offset)
+
+    game.score, game.lives, game.time, game.started = score, lives, tick, started
+    ship = game.my_ship
+    ship.pos[:] = [x, y]
+    ship.vel[:] = [vx, vy]
+    ship.angle, ship.angle_vel, ship.thrust = angle, angle_vel, thrust
+    random.setstate((rng[0], tuple(rng[1:626]), rng[627] if rng[626] else None))
+
+    for group in (game.rock_group, game.missile_group, game.explosion_group):
+        _clear(game, group)
+
+    i = 0
+    for _ in range(n_rocks):
+        v = values[i:i + SPRITE_FIELDS]
+        a_rock = game.Sprite(v[0:2], v[2:4], v[4], v[5], game.asteroid_image, game.asteroid_info)
+        a_rock.age = int(v[6])
+        game.rock_group.add(a_rock)
+        i += SPRITE_FIELDS
+    game.rock_hash.rebuild(game.rock_group)
+    for pool, count in ((game.missile_pool, n_missiles), (game.explosion_pool, n_explosions)):
+        for _ in range(count):
+            v = values[i:i + SPRITE_FIELDS]
+            pool.acquire(v[0:2], v[2:4], v[4], v[5], int(v[6]), quiet=True)
+            i += SPRITE_FIELDS
+
+
+def save(game: ModuleType, path: Path) -> None:
+    Path(path).write_bytes(snapshot(game))
+
+
+def load(game: ModuleType, path: Path) -> None:
+    restore(game, Path(path).read_bytes())
+
+# ------------------------------------------------------------------
+# CLI
+# ------------------------------------------------------------------
+
+def main(argv: Sequence[str] | None = None) -> None:
+    """Time snapshot and restore on a headless game after a short bot session."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Measure RiceRocks snapshot size and speed.")
+    parser.add_argument("--ticks", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    from headless_runner import TickRunner, load_game
+    game = load_game()
+    runner = TickRunner(game)
+    runner.press_start()
+    for tick in range(args.ticks):
+        if tick % 7 == 0:
+            game.my_ship.shoot()
+        runner.step()
+
+    blob = snapshot(game)
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        snapshot(game)
+    taken = (time.perf_counter() - start) / args.repeat
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        restore(game, blob)
+    restored = (time.perf_counter() - start) / args.repeat
+    print(f"{len(blob)} bytes, snapshot {taken * 1e6:.1f} us, restore {restored * 1e6:.1f} us "
+          f"({len(game.rock_group)} rocks, {len(game.missile_group)} missiles, {len(game.explosion_group)} explosions)")
+
+
+if __name__ == "__main__":
+    main()
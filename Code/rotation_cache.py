@@ -0,0 +1,163 @@
+"""
+Cache of pre-rotated sprite frames.
+simplegui rotates a bitmap on every draw_image call with a non-zero angle.
+Here angles are snapped to one of N buckets per turn and each (frame,
+bucket) is rendered once with Pillow into a local PNG, loaded through
+simplegui and then blitted unrotated. Rendering and loading run on a
+background worker, never inside a frame: until a rotated frame is ready
+the canvas keeps rotating the sprite itself, and prerender() queues a
+sprite's buckets ahead of use. Games make the cache on their first
+drawn frame, so a game loaded only to be simulated starts no worker.
+Loaded frames are kept in LRU order under a memory budget; evicted ones
+are reloaded from disk the same way on their next use.
+"""
+
+from __future__ import annotations
+import hashlib
+import math
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Optional, Sequence
+
+try:
+    from PIL import Image
+except ImportError:
+    # without Pillow there is no cache and the canvas rotates every draw
+    Image = None
+
+from asset_cache import CACHE_DIR
+from background_strip import image_path
+
+ROTATED_DIR: Path = CACHE_DIR / "rotated"
+
+# (image, center_source, size_source) of a rotated frame, drawn with rotation 0
+Frame = tuple[Any, list[float], list[float]]
+
+# rotate(tile, angle) -> the tile turned by angle radians the way simplegui
+# turns it (clockwise on screen), on a canvas grown to fit
+Rotate = Callable[[Any, float], Any]
+
+
+def pil_rotate(tile: Any, angle: float) -> Any:
+    return tile.rotate(-math.degrees(angle), resample=Image.BICUBIC, expand=True)
+
+
+class RotationCache:
+    """Pre-rotated frames keyed by source frame and angle bucket, LRU under a byte budget."""
+
+    def __init__(self, load_image: Callable[[str], Any], buckets: int = 64,
+                 budget: int = 16 * 2 ** 20, rotate: Rotate = pil_rotate, workers: int = 1) -> None:
+        self.load_image = load_image
+        self.buckets = buckets
+        self.budget = budget
+        self.rotate = rotate
+        self.frames: OrderedDict[tuple, tuple[Frame, int]] = OrderedDict()
+        self.pending: dict[tuple, Future] = {}
+        self.paths: dict[Any, Optional[Path]] = {}
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rotate")
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def snap(self, angle: float) -> int:
+        """The bucket an angle falls in."""
+        return round(angle * self.buckets / (2 * math.pi)) % self.buckets
+
+    def _render(self, path: Path, center: Sequence[float], size: Sequence[float],
+                bucket: int) -> tuple[Frame, int]:
+        """Rotated frame and its byte cost; runs on the worker."""
+        key = repr((str(path), list(center), list(size), bucket, self.buckets))
+        target = ROTATED_DIR / (hashlib.sha256(key.encode()).hexdigest() + ".png")
+        if target.exists():
+            # only the header is read
+            with Image.open(target) as tile:
+                width, height = tile.size
+        else:
+            with Image.open(path) as source:
+                box = (round(center[0] - size[0] / 2), round(center[1] - size[1] / 2),
+                       round(center[0] + size[0] / 2), round(center[1] + size[1] / 2))
+                tile = source.convert("RGBA").crop(box)
+            rotated = self.rotate(tile, bucket * 2 * math.pi / self.buckets)
+            width, height = rotated.size
+            ROTATED_DIR.mkdir(parents=True, exist_ok=True)
+            rotated.save(target)
+        frame = (self.load_image(str(target)), [width / 2.0, height / 2.0], [width, height])
+        return frame, 4 * width * height
+
+    def _key(self, image: Any, center: Sequence[float], size: Sequence[float], bucket: int) -> Optional[tuple]:
+        path = self.paths.get(image, False)
+        if path is False:
+            path = self.paths[image] = image_path(image)
+        if path is None:
+            return None
+        return (path, center[0], center[1], size[0], size[1], bucket)
+
+    def _queue(self, key: tuple, center: Sequence[float], size: Sequence[float]) -> None:
+        if key not in self.pending and key not in self.frames:
+            self.misses += 1
+            self.pending[key] = self.executor.submit(self._render, key[0], center, size, key[5])
+
+    def prerender(self, image: Any, centers: Sequence[Sequence[float]], size: Sequence[float]) -> None:
+        """Queue every bucket of the frames at centers, e.g. while the game loads."""
+        for center in centers:
+            for bucket in range(1, self.buckets):
+                key = self._key(image, center, size, bucket)
+                if key is None:
+                    return
+                self._queue(key, center, size)
+
+    def get(self, image: Any, center: Sequence[float], size: Sequence[float], angle: float) -> Optional[Frame]:
+        """
+        The frame to blit unrotated for image turned by angle. None if it
+        cannot be cached or is still being rendered - the caller rotates
+        the source rect itself then.
+        """
+        bucket = self.snap(angle)
+        key = self._key(image, center, size, bucket)
+        if key is None:
+            return None
+        if bucket == 0:
+            return image, center, size
+
+        entry = self.frames.get(key)
+        if entry is not None:
+            self.frames.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        future = self.pending.get(key)
+        if future is None:
+            self._queue(key, center, size)
+            return None
+        if not future.done():
+            return None
+        del self.pending[key]
+        if future.exception() is not None:
+            # unreadable source - stop trying to cache this image
+            for source, path in self.paths.items():
+                if path == key[0]:
+                    self.paths[source] = None
+            return None
+
+        frame, cost = future.result()
+        self.frames[key] = (frame, cost)
+        self.used += cost
+        while self.used > self.budget and len(self.frames) > 1:
+            _, (_, freed) = self.frames.popitem(last=False)
+            self.used -= freed
+            self.evictions += 1
+        return frame
+
+    def stats(self) -> dict[str, int]:
+        return {"frames": len(self.frames), "pending": len(self.pending), "bytes": self.used,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+def make_rotation_cache(load_image: Callable[[str], Any], buckets: int = 64, budget: int = 16 * 2 ** 20,
+                        rotate: Rotate = pil_rotate) -> Optional[RotationCache]:
+    """A RotationCache loading frames with load_image, or None without Pillow."""
+    if Image is None:
+        return None
+    return RotationCache(load_image, buckets, budget, rotate)
@@ -0,0 +1,182 @@
+"""
+Headless stand-in for CodeSkulptor's simplegui module.
+Frames, timers, images and sounds are inert objects, so a game's draw and
+timer handlers can be driven from plain Python without a browser canvas.
+"""
+
+from __future__ import annotations
+from typing import Callable, Optional
+
+# ------------------------------------------------------------------
+# Key codes (same values as CodeSkulptor)
+# ------------------------------------------------------------------
+
+KEY_MAP: dict[str, int] = {"left": 37, "up": 38, "right": 39, "down": 40, "space": 32}
+KEY_MAP.update({chr(c): c - 32 for c in range(ord("a"), ord("z") + 1)})
+KEY_MAP.update({str(d): 48 + d for d in range(10)})
+
+# ------------------------------------------------------------------
+# Assets
+# ------------------------------------------------------------------
+
+class HeadlessImage:
+    """Image stub that remembers its URL and reports a fixed size."""
+
+    def __init__(self, url: str, width: int = 0, height: int = 0) -> None:
+        self.url = url
+        self.width = width
+        self.height = height
+
+    def get_width(self) -> int:
+        return self.width
+
+    def get_height(self) -> int:
+        return self.height
+
+
+class HeadlessSound:
+    """Sound stub; playback calls only update its state."""
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.playing = False
+        self.volume = 1.0
+
+    def play(self) -> None:
+        self.playing = True
+
+    def pause(self) -> None:
+        self.playing = False
+
+    def rewind(self) -> None:
+        self.playing = False
+
+    def set_volume(self, volume: float) -> None:
+        self.volume = volume
+
+
+def load_image(url: str) -> HeadlessImage:
+    return HeadlessImage(url)
+
+
+def load_sound(url: str) -> HeadlessSound:
+    return HeadlessSound(url)
+
+# ------------------------------------------------------------------
+# Canvas, frame and timers
+# ------------------------------------------------------------------
+
+class NullCanvas:
+    """Canvas whose drawing methods do nothing."""
+
+    def draw_image(self, *args) -> None:
+        pass
+
+    def draw_text(self, *args) -> None:
+        pass
+
+    def draw_line(self, *args) -> None:
+        pass
+
+    def draw_polyline(self, *args) -> None:
+        pass
+
+    def draw_polygon(self, *args) -> None:
+        pass
+
+    def draw_circle(self, *args) -> None:
+        pass
+
+    def draw_point(self, *args) -> None:
+        pass
+
+
+class HeadlessControl:
+    """Button, label or input box; keeps its text only."""
+
+    def __init__(self, text: str = "") -> None:
+        self.text = text
+
+    def get_text(self) -> str:
+        return self.text
+
+    def set_text(self, text: str) -> None:
+        self.text = text
+
+
+class HeadlessFrame:
+    """Frame that stores its handlers; start() returns immediately."""
+
+    def __init__(self, title: str, width: int, height: int) -> None:
+        self.title = title
+        self.width = width
+        self.height = height
+        self.draw_handler: Optional[Callable] = None
+        self.keydown_handler: Optional[Callable] = None
+        self.keyup_handler: Optional[Callable] = None
+        self.mouseclick_handler: Optional[Callable] = None
+        self.mousedrag_handler: Optional[Callable] = None
+        self.canvas = NullCanvas()
+        self.running = False
+
+    def set_draw_handler(self, handler: Callable) -> None:
+        self.draw_handler = handler
+
+    def set_keydown_handler(self, handler: Callable) -> None:
+        self.keydown_handler = handler
+
+    def set_keyup_handler(self, handler: Callable) -> None:
+        self.keyup_handler = handler
+
+    def set_mouseclick_handler(self, handler: Callable) -> None:
+        self.mouseclick_handler = handler
+
+    def set_mousedrag_handler(self, handler: Callable) -> None:
+        self.mousedrag_handler = handler
+
+    def set_canvas_background(self, color: str) -> None:
+        pass
+
+    def add_button(self, text: str, handler: Callable, width: int = 0) -> HeadlessControl:
+        return HeadlessControl(text)
+
+    def add_label(self, text: str, width: int = 0) -> HeadlessControl:
+        return HeadlessControl(text)
+
+    def add_input(self, text: str, handler: Callable, width: int) -> HeadlessControl:
+        return HeadlessControl(text)
+
+    def get_canvas_textwidth(self, text: str, size: int, face: str = "serif") -> int:
+        return len(text) * size // 2
+
+    def start(self) -> None:
+        self.running = True
+
+    def stop(self) -> None:
+        self.running = False
+
+
+class HeadlessTimer:
+    """Timer that never fires by itself; a runner calls its handler."""
+
+    def __init__(self, interval: float, handler: Callable) -> None:
+        self.interval = interval
+        self.handler = handler
+        self.running = False
+
+    def start(self) -> None:
+        self.running = True
+
+    def stop(self) -> None:
+        self.running = False
+
+    def is_running(self) -> bool:
+        return self.running
+
+
+def create_frame(title: str, width: int, height: int, control_width: int = 200) -> HeadlessFrame:
+    return HeadlessFrame(title, width, height)
+
+
+def create_timer(interval: float, handler: Callable) -> HeadlessTimer:
+    return HeadlessTimer(interval, handler)
@@ -0,0 +1,121 @@
+"""
+Texture atlas builder for the simplegui games.
+Packs a game's images into one sheet with Pillow (shelf packing, tallest
+first), records where each image landed and moves every ImageInfo onto
+its region, so all sprites draw out of a single bitmap with source rects
+worked out once. Games hand over the files before loading any image and
+load only the sheet. Sheets and their rect tables are kept on disk keyed
+by the source files, so packing only happens when an image changes.
+
+    python texture_atlas.py ship.png explosion.png ...
+"""
+
+from __future__ import annotations
+import argparse
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Callable, Optional, Sequence
+
+try:
+    from PIL import Image
+except ImportError:
+    # without Pillow there is no atlas and every image stays its own bitmap
+    Image = None
+
+from asset_cache import CACHE_DIR
+
+ATLAS_DIR: Path = CACHE_DIR / "atlas"
+
+# widest sheet a shelf may grow to, and empty pixels kept between images
+# so filtering at a region's edge never samples its neighbour
+MAX_WIDTH: int = 4096
+PADDING: int = 2
+
+# ------------------------------------------------------------------
+# Packing
+# ------------------------------------------------------------------
+
+def pack(sizes: Sequence[tuple[int, int]], max_width: int = MAX_WIDTH,
+         padding: int = PADDING) -> tuple[list[tuple[int, int]], tuple[int, int]]:
+    """Top-left corner for each size on shelves, and the sheet size they need."""
+    width = max([max_width] + [w + padding for w, _ in sizes])
+    origins: list[tuple[int, int]] = [(0, 0)] * len(sizes)
+    x = y = shelf = used = 0
+    for i in sorted(range(len(sizes)), key=lambda i: -sizes[i][1]):
+        w, h = sizes[i]
+        if x + w > width:
+            x, y, shelf = 0, y + shelf + padding, 0
+        origins[i] = (x, y)
+        x += w + padding
+        shelf = max(shelf, h)
+        used = max(used, x - padding)
+    return origins, (used, y + shelf)
+
+
+def build(paths: Sequence[Path]) -> tuple[Path, dict[str, list[int]]]:
+    """Pack the image files into one sheet; returns it with the {path: [x, y, w, h]} table."""
+    stamps = [(str(path), path.stat().st_size, path.stat().st_mtime_ns) for path in paths]
+    name = hashlib.sha256(repr((stamps, MAX_WIDTH, PADDING)).encode()).hexdigest()
+    sheet = ATLAS_DIR / (name + ".png")
+    table_file = ATLAS_DIR / (name + ".json")
+    if sheet.exists() and table_file.exists():
+        return sheet, json.loads(table_file.read_text())
+
+    images = [Image.open(path).convert("RGBA") for path in paths]
+    origins, size = pack([image.size for image in images])
+    atlas = Image.new("RGBA", size, (0, 0, 0, 0))
+    table = {}
+    for path, image, origin in zip(paths, images, origins):
+        atlas.paste(image, origin)
+        table[str(path)] = [origin[0], origin[1], image.size[0], image.size[1]]
+        image.close()
+
+    ATLAS_DIR.mkdir(parents=True, exist_ok=True)
+    atlas.save(sheet)
+    table_file.write_text(json.dumps(table, indent=1))
+    return sheet, table
+
+# ------------------------------------------------------------------
+# Games
+# ------------------------------------------------------------------
+
+def make_atlas(load_image: Callable[[str], Any], assets: Sequence[tuple[str, Any]]) -> Optional[Any]:
+    """
+    Pack the image files of (path, info) pairs into one sheet, place each
+    info on its file's region and return the sheet loaded with load_image,
+    so the separate images never need loading. None, with the infos
+    untouched, without Pillow or if any path is not a local file (e.g. an
+    asset URL that is not cached).
+    """
+    paths = [Path(path) for path, _ in assets]
+    if Image is None or not all(path.is_file() for path in paths):
+        return None
+
+    sheet, table = build(sorted(set(paths)))
+    placed = set()
+    for path, (_, info) in zip(paths, assets):
+        if id(info) not in placed:
+            placed.add(id(info))
+            info.place(table[str(path)][:2])
+    return load_image(str(sheet))
+
+# ------------------------------------------------------------------
+# CLI
+# ------------------------------------------------------------------
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Pack images into one atlas sheet and print the rect table.")
+    parser.add_argument("images", type=Path, nargs="+")
+    args = parser.parse_args(argv)
+    if Image is None:
+        parser.error("Pillow is required to build an atlas")
+
+    sheet, table = build([path.resolve() for path in args.images])
+    print(sheet)
+    for path, (x, y, w, h) in table.items():
+        print(f"{x:>5} {y:>5} {w:>5} {h:>5}  {path}")
+
+
+if __name__ == "__main__":
+    main()